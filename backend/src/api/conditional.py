@@ -0,0 +1,167 @@
+"""Conditional GET helpers for the polled API endpoints.
+
+Every polled endpoint exposes an ETag built from a version counter
+(the ingest generation for EEG metrics, see ``src.state``). Clients that send the tag back
+in ``If-None-Match`` get an empty 304 response, and can optionally ask
+the server to hold the request open until the tag changes
+(``?wait_for_change=<seconds>``).
+
+Waiting requests do not poll on their own: all requests waiting on the
+same tag share one background task that re-checks it every
+``POLL_INTERVAL`` seconds and wakes them through an ``asyncio.Event``,
+so the cost of idle dashboards does not grow with their number.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+# How often a long-poll re-checks the version while waiting (seconds)
+POLL_INTERVAL = 0.25
+
+# Upper bound for ?wait_for_change= (seconds)
+MAX_WAIT = 60.0
+
+# How often a waiting request checks whether its client has gone (seconds)
+DISCONNECT_CHECK_INTERVAL = 1.0
+
+
+class _Watch:
+    """Background check of one ETag shared by the requests waiting on it.
+
+    Attributes:
+        etag (str | None): Tag the waiters hold; replaced by the new tag on
+            change, or by None if checking it failed.
+        changed (asyncio.Event): Set once the tag changed or could not be checked.
+        waiters (int): Requests currently waiting.
+        task (asyncio.Task): The checking task, kept referenced while it runs.
+
+    """
+
+    def __init__(self, etag: str):
+        self.etag = etag
+        self.changed = asyncio.Event()
+        self.waiters = 0
+        self.task = None
+
+
+# Active watches by the ETag they wait to change
+_watches: dict[str, _Watch] = {}
+
+
+async def _watch(watch: _Watch, get_etag: Callable[[], str]) -> None:
+    etag = watch.etag
+    try:
+        while watch.waiters:
+            await asyncio.sleep(POLL_INTERVAL)
+            current = await run_in_threadpool(get_etag)
+            if current != etag:
+                watch.etag = current
+                break
+    except Exception:
+        # Wake the waiters; each checks the tag itself and fails (or answers) like any request
+        logging.getLogger(__name__).exception("Checking ETag %s failed", etag)
+        watch.etag = None
+    finally:
+        watch.changed.set()
+        if _watches.get(etag) is watch:
+            del _watches[etag]
+
+
+def make_etag(kind: str, version) -> str:
+    """Build a strong ETag for an endpoint kind and version.
+
+    Args:
+        kind: Short endpoint name, e.g. "current".
+        version: Version tag the response body is derived from. It must
+            change across server restarts (see ``StateStore.version``).
+
+    Returns:
+        str: Quoted ETag value.
+
+    """
+    return f'"{kind}-{version}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Return True if the request's If-None-Match header matches ``etag``."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """Return an empty 304 response carrying ``etag``."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Attach ``etag`` to a 200 response and ask clients to revalidate."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+
+async def conditional_etag(
+    request: Request,
+    get_etag: Callable[[], str],
+    wait_for_change: float = 0.0,
+) -> tuple[str, bool]:
+    """Resolve the ETag for a request, long-polling if asked to.
+
+    If the client's If-None-Match matches the current tag and
+    ``wait_for_change`` is positive, the request waits until the tag
+    changes or the wait expires. The tag is re-checked every
+    ``POLL_INTERVAL`` seconds by a single task per tag, whatever the
+    number of waiting requests.
+
+    Args:
+        request: Incoming request.
+        get_etag: Callable returning the endpoint's current ETag. Must be
+            cheap; it may block, and is run in the thread pool.
+        wait_for_change: Maximum number of seconds to wait for a new version.
+
+    Returns:
+        tuple[str, bool]: Current ETag and whether the client already has it.
+
+    """
+    etag = await run_in_threadpool(get_etag)
+    if not etag_matches(request, etag):
+        return etag, False
+    deadline = time.monotonic() + min(max(wait_for_change, 0.0), MAX_WAIT)
+    if deadline <= time.monotonic():
+        return etag, True
+    watch = _watches.get(etag)
+    if watch is None:
+        watch = _watches[etag] = _Watch(etag)
+        watch.waiters += 1
+        watch.task = asyncio.create_task(_watch(watch, get_etag))
+    else:
+        watch.waiters += 1
+    try:
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                await asyncio.wait_for(watch.changed.wait(), min(remaining, DISCONNECT_CHECK_INTERVAL))
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                continue
+            current = watch.etag
+            if current is None:
+                current = await run_in_threadpool(get_etag)
+            return current, etag_matches(request, current)
+    finally:
+        watch.waiters -= 1
+    return etag, True
@@ -0,0 +1,67 @@
+"""API routes for streaming EEG from remote connectors.
+
+A connector running next to a headset anywhere on the network POSTs
+preprocessed chunks as binary frames (see ``src.ingest_protocol``) to
+``/api/ingest/{device_id}``. The frames go straight into that device's
+in-memory buffer; its metrics are read with ``?device=<device_id>`` on
+``/current`` and ``/mean_metrics``.
+
+The endpoint is unauthenticated, so the number of devices it keeps
+buffers for is capped (``HOTB_MAX_DEVICES``, idle devices are dropped
+after ``HOTB_DEVICE_IDLE_SECONDS``); a new device beyond the cap gets 429.
+"""
+
+from fastapi import APIRouter, HTTPException, Path, Request
+from starlette.concurrency import run_in_threadpool
+
+from src.api.mental_metric_routes import DEVICE_ID_PATTERN
+from src.models.metrics_buffer import DeviceLimitError
+from src.state import get_state
+
+router = APIRouter()
+
+# Largest accepted request body (about 17 minutes of 8-channel float32 at 250 Hz)
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+
+@router.post("/ingest/{device_id}")
+async def ingest_frames(
+    request: Request,
+    device_id: str = Path(..., pattern=DEVICE_ID_PATTERN),
+):
+    """Accept a batch of frames from a remote connector.
+
+    Args:
+        device_id: Id the headset's data is filed under.
+
+    Returns:
+        dict: Acknowledgement; "ack" is the highest sequence number
+        taken, frames up to it need not be resent.
+
+    Raises:
+        HTTPException: 413 if the body is too large, 400 if it is malformed,
+            429 if the device is new and the device limit is reached.
+
+    """
+    import logging
+
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Request body too large")
+    body = await request.body()
+    if len(body) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Request body too large")
+    try:
+        # Filtering the frames is CPU work; keep it off the event loop
+        ack = await run_in_threadpool(get_state().ingest, device_id, body)
+    except ValueError as exc:
+        logging.getLogger(__name__).warning("Rejected ingest from %s: %s", device_id, exc)
+        raise HTTPException(status_code=400, detail=str(exc))
+    except DeviceLimitError as exc:
+        logging.getLogger(__name__).warning("Refused ingest from new device %s: %s", device_id, exc)
+        raise HTTPException(status_code=429, detail=str(exc))
+    logging.getLogger(__name__).info(
+        "Ingested from %s: %d accepted, %d duplicates, %d rejected, ack %d",
+        device_id, ack["accepted"], ack["duplicates"], ack["rejected"], ack["ack"],
+    )
+    return ack
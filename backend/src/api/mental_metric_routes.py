@@ -2,24 +2,66 @@
 
 This module exposes an endpoint to retrieve the current computed metrics
 for stress, focus, and tiredness.
+
+Polled endpoints support conditional GET: they return an ETag and answer
+a matching ``If-None-Match`` with 304. Passing ``?wait_for_change=<seconds>``
+turns a matching request into a long-poll that returns as soon as the
+data changes.
+
+``/current``, ``/mean_metrics`` and ``/signal`` report the local headset by default;
+``?device=<id>`` selects a headset streaming to ``/api/ingest/<id>``.
+
+State store calls can block (a proxy round trip in multi-worker mode), so
+they run in the thread pool. Results are cached per worker by ETag: a
+request for a version this worker has already fetched costs a single
+version lookup.
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query, Request, Response
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from src.models import mean_metrics, update_models_from_latest_csv
-from src.models.focus_model import focus_service
-from src.models.music_model import music_service
-from src.models.pomodoro_model import PomodoroStepper
-
-# Import singleton model instances
-from src.models.stress_model import stress_service
-from src.models.tiredness_model import tiredness_service
+from src.api.conditional import MAX_WAIT, conditional_etag, make_etag, not_modified, set_etag
+from src.models.montage import get_montage
+from src.models.signal_view import HISTORY_SECONDS
+from src.state import get_state
 
 router = APIRouter()
 
+WAIT_FOR_CHANGE = Query(
+    0.0, ge=0.0, le=MAX_WAIT,
+    description="Seconds to wait for new data when If-None-Match matches.",
+)
+
+# Device ids end up in ETags, so they are limited to token characters
+DEVICE_ID_PATTERN = r"^[A-Za-z0-9_.-]{1,64}$"
+
+DEVICE = Query(
+    None, pattern=DEVICE_ID_PATTERN,
+    description="Remote device id (default: the local headset).",
+)
+
+
+# Results fetched from the state store: (etag, *args) -> result, least recently used first
+_results = OrderedDict()
+MAX_CACHED_RESULTS = 64
+
+
+async def _fetch(etag: str, read, *args):
+    """Return ``read(*args)`` for the data version ``etag``, from the cache if possible."""
+    key = (etag, *args)
+    if key in _results:
+        _results.move_to_end(key)
+        return _results[key]
+    result = await run_in_threadpool(read, *args)
+    _results[key] = result
+    while len(_results) > MAX_CACHED_RESULTS:
+        _results.popitem(last=False)
+    return result
+
 
 class MetricsResponse(BaseModel):
     """Response model containing computed metrics.
@@ -36,8 +78,37 @@ class MetricsResponse(BaseModel):
     tiredness_level: int
     timestamp: str
 
+def _device_kind(kind: str, device: str | None) -> str:
+    return kind if device is None else f"{kind}-{device}"
+
+
+def _current_etag(device: str | None = None) -> str:
+    return make_etag(_device_kind("current", device), get_state().version("current", device))
+
+
+def _mean_etag(device: str | None = None) -> str:
+    return make_etag(_device_kind("mean", device), get_state().version("mean", device))
+
+
+def _signal_etag(device: str | None = None) -> str:
+    return make_etag(_device_kind("signal", device), get_state().version("current", device))
+
+
+def _music_etag() -> str:
+    return make_etag("music", get_state().version("music"))
+
+
+def _pomodoro_etag() -> str:
+    return make_etag("pomodoro", get_state().version("pomodoro"))
+
+
 @router.get("/mean_metrics")
-async def get_mean_metrics():
+async def get_mean_metrics(
+    request: Request,
+    response: Response,
+    wait_for_change: float = WAIT_FOR_CHANGE,
+    device: str | None = DEVICE,
+):
     """Return mean metrics averaged over the last 2 minutes (EEG buffer).
 
     Returns:
@@ -49,7 +120,10 @@ async def get_mean_metrics():
     """
     import datetime as dt
     import logging
-    result = mean_metrics()
+    etag, unchanged = await conditional_etag(request, lambda: _mean_etag(device), wait_for_change)
+    if unchanged:
+        return not_modified(etag)
+    result = await _fetch(etag, get_state().mean, device)
     if result is None:
         logging.getLogger(__name__).warning("No data in EEG buffer for mean_metrics endpoint.")
         raise HTTPException(status_code=404, detail="Brak danych w buforze")
@@ -58,6 +132,7 @@ async def get_mean_metrics():
         "Returned mean_metrics: focus=%d, stress=%d, tiredness=%d, timestamp=%s",
         result["focus_level"], result["stress_level"], result["tiredness_level"], ts_str,
     )
+    set_etag(response, etag)
     return {
         "timestamp": ts_str,
         "focus_level": result["focus_level"],
@@ -66,8 +141,13 @@ async def get_mean_metrics():
     }
 
 @router.get("/current", response_model=MetricsResponse)
-async def get_current():
-    """Return the latest computed metrics from the model singletons.
+async def get_current(
+    request: Request,
+    response: Response,
+    wait_for_change: float = WAIT_FOR_CHANGE,
+    device: str | None = DEVICE,
+):
+    """Return the metrics computed from the latest snapshot.
 
     Returns:
         MetricsResponse: Current stress, focus and tiredness levels.
@@ -76,18 +156,23 @@ async def get_current():
     import datetime as dt
     import logging
 
-    mean_ts = update_models_from_latest_csv()
-    stress = stress_service.get_value()
-    focus = focus_service.get_value()
-    tiredness = tiredness_service.get_value()
-    if mean_ts is not None:
-        ts_str = dt.datetime.fromtimestamp(mean_ts).isoformat()
+    etag, unchanged = await conditional_etag(request, lambda: _current_etag(device), wait_for_change)
+    if unchanged:
+        return not_modified(etag)
+    latest = await _fetch(etag, get_state().current, device)
+    if latest is not None:
+        stress = latest["stress_level"]
+        focus = latest["focus_level"]
+        tiredness = latest["tiredness_level"]
+        ts_str = dt.datetime.fromtimestamp(latest["timestamp"]).isoformat()
     else:
+        stress = focus = tiredness = 0
         ts_str = dt.datetime.now().isoformat()
     logging.getLogger(__name__).info(
         "Returned metrics: stress=%d, focus=%d, tiredness=%d, timestamp=%s",
         stress, focus, tiredness, ts_str,
     )
+    set_etag(response, etag)
     return {
         "timestamp": ts_str,
         "stress_level": stress,
@@ -96,15 +181,56 @@ async def get_current():
     }
 
 
+@router.get("/signal")
+async def get_signal(
+    request: Request,
+    response: Response,
+    width: int = Query(800, ge=1, le=4000, description="Number of points per channel (chart width in pixels)."),
+    seconds: float = Query(30.0, gt=0.0, le=HISTORY_SECONDS, description="Time span to return."),
+    wait_for_change: float = WAIT_FOR_CHANGE,
+    device: str | None = DEVICE,
+):
+    """Return the latest filtered EEG, downsampled for a live chart.
+
+    Every channel is reduced to ``width`` buckets; each bucket carries the
+    minimum and maximum sample, so drawing a vertical line between them
+    per pixel reproduces the full-rate trace.
+
+    Returns:
+        dict: Channel names, bucket length in seconds, bucket start times
+        and per-channel min/max lists.
+
+    Raises:
+        HTTPException: If there is no signal yet.
+
+    """
+    etag, unchanged = await conditional_etag(request, lambda: _signal_etag(device), wait_for_change)
+    if unchanged:
+        return not_modified(etag)
+    result = await _fetch(etag, get_state().signal, device, seconds, width)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Brak danych w buforze")
+    set_etag(response, etag)
+    return {"channels": get_montage().channels, **result}
+
+
 @router.get("/music")
-async def get_music():
+async def get_music(
+    request: Request,
+    response: Response,
+    wait_for_change: float = WAIT_FOR_CHANGE,
+):
     """Return the recommended music type based on current metrics.
 
     Returns:
         dict: Recommended music type.
 
     """
-    recommended_type = music_service.get_value()
+    etag, unchanged = await conditional_etag(request, _music_etag, wait_for_change)
+    if unchanged:
+        return not_modified(etag)
+    set_etag(response, etag)
+    recommended_type = await _fetch(etag, get_state().music)
     if recommended_type == "none":
         recommended_type = "focus"
     return {
@@ -138,9 +264,6 @@ async def get_history(limit: int = 10):
     return data_points
 
 
-pomodoro_stepper = PomodoroStepper()
-
-
 @router.post("/pomodoro/update_times")
 async def update_pomodoro_times(
     work_time: int = Body(..., embed=True),
@@ -150,8 +273,8 @@ async def update_pomodoro_times(
     """
     Update Pomodoro stepper times (work, short break, long break) in minutes.
     """
-    global pomodoro_stepper
-    pomodoro_stepper = PomodoroStepper(
+    await run_in_threadpool(
+        get_state().set_pomodoro_times,
         session_length=work_time,
         break_length=short_break_time,
         long_break_length=long_break_time,
@@ -159,13 +282,21 @@ async def update_pomodoro_times(
     return {"status": "ok", "work_time": work_time, "short_break_time": short_break_time, "long_break_time": long_break_time}
 
 @router.get("/pomodoro/config")
-async def get_pomodoro_config():
+async def get_pomodoro_config(
+    request: Request,
+    response: Response,
+    wait_for_change: float = WAIT_FOR_CHANGE,
+):
     """
     Return current Pomodoro config (work, shortBreak, longBreak) in seconds.
     """
-    # Użyj domyślnego PomodoroStepper z aktualnymi wartościami
+    etag, unchanged = await conditional_etag(request, _pomodoro_etag, wait_for_change)
+    if unchanged:
+        return not_modified(etag)
+    set_etag(response, etag)
+    config = await _fetch(etag, get_state().pomodoro_config)
     return {
-        "work": pomodoro_stepper.session_length * 60,
-        "shortBreak": pomodoro_stepper.break_length * 60,
-        "longBreak": pomodoro_stepper.long_break_length * 60,
+        "work": config["session_length"] * 60,
+        "shortBreak": config["break_length"] * 60,
+        "longBreak": config["long_break_length"] * 60,
     }
@@ -0,0 +1,407 @@
+"""Compressed long-term archive for EEG recordings.
+
+An archive stores a recording as independently compressed blocks of a
+few seconds each. Samples are quantized to a fixed resolution (in the
+units of the recording, µV for BrainAccess) and delta-encoded along
+time: each block keeps the first value of every channel as int64 and
+the steps between samples as int32, so a step may be at most
+2**31 * resolution. Timestamps are stored as delta-encoded microsecond
+offsets. Each block is compressed with zlib or lzma from the standard
+library.
+
+File layout::
+
+    b"HOTBARC1" | u32 header length | JSON header
+    block*:  <ddII> t_start, t_end, n_samples, payload length | payload
+             payload: i8 time offsets (n_samples) | i8 first values (n_channels)
+                      | i4 steps (n_channels x n_samples - 1), channel-major
+    index:   <QddI> offset, t_start, t_end, n_samples   (one per block)
+    footer:  <Q> index offset | b"HOTBIDX1"
+
+The index lets a reader decode any time range without inflating the
+whole file. If the index is missing (the writer was not closed), the
+reader rebuilds it by walking the block headers.
+
+Command line (from the backend directory)::
+
+    python -m src.archive convert BrainAccessData/*-snapshot.csv
+    python -m src.archive convert recording-raw.fif
+    python -m src.archive info recording.eegz
+"""
+
+import bisect
+import json
+import lzma
+import os
+import struct
+import zlib
+
+MAGIC = b"HOTBARC1"
+INDEX_MAGIC = b"HOTBIDX1"
+ARCHIVE_SUFFIX = ".eegz"
+
+_BLOCK = struct.Struct("<ddII")
+_INDEX_ENTRY = struct.Struct("<QddI")
+_FOOTER = struct.Struct("<Q8s")
+_HEADER_LEN = struct.Struct("<I")
+
+# Timestamps are stored with microsecond resolution; range queries allow for the rounding
+_TIME_TOLERANCE = 5e-7
+
+# Archive layout version written to the header (1: first value not stored separately)
+FORMAT_VERSION = 2
+
+# Range of a quantized step between samples
+_STEP_LIMIT = 2**31 - 1
+# Range of a quantized sample (kept well inside int64 so the float64 rounding is exact)
+_VALUE_LIMIT = 2**53
+
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+
+
+class ArchiveWriter:
+    """Write a recording to a compressed archive.
+
+    Samples passed to ``write`` are buffered and flushed as one block per
+    ``block_seconds`` of data. Use as a context manager or call ``close``
+    to write the index.
+
+    Attributes:
+        channels (list[str]): Channel names.
+        sfreq (float): Sampling frequency in Hz.
+        resolution (float): Quantization step; max error is resolution / 2.
+
+    """
+
+    def __init__(self, path, channels, sfreq, resolution=1e-3, codec="zlib", block_seconds=10.0):
+        """Create the archive file and write its header.
+
+        Args:
+            path: Output file path.
+            channels: Channel names.
+            sfreq: Sampling frequency in Hz.
+            resolution: Quantization step in recording units.
+            codec: "zlib" or "lzma".
+            block_seconds: Length of a block (the unit of random access).
+
+        Raises:
+            ValueError: If the codec is unknown.
+
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {', '.join(CODECS)}")
+        self.channels = list(channels)
+        self.sfreq = float(sfreq)
+        self.resolution = float(resolution)
+        self._compress = CODECS[codec][0]
+        self._block_samples = max(int(block_seconds * self.sfreq), 1)
+        self._pending = []
+        self._pending_samples = 0
+        self._index = []
+        # Last quantized sample written, to check the step to the next one
+        self._last = None
+        self._file = open(path, "wb")
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "channels": self.channels,
+            "sfreq": self.sfreq,
+            "resolution": self.resolution,
+            "codec": codec,
+        }).encode()
+        self._file.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+
+    def write(self, times, data):
+        """Append samples.
+
+        Args:
+            times: np.ndarray, shape (n_samples,), epoch seconds, non-decreasing.
+            data: np.ndarray, shape (n_samples, n_channels).
+
+        Raises:
+            ValueError: If the shape is wrong, a value is not finite, or a
+                value or a step between samples is too large for the
+                resolution. Nothing is written in that case.
+
+        """
+        import numpy as np
+
+        times = np.asarray(times, dtype=np.float64)
+        data = np.asarray(data)
+        if data.shape != (len(times), len(self.channels)):
+            raise ValueError(f"Expected data of shape ({len(times)}, {len(self.channels)}), got {data.shape}")
+        if not (np.isfinite(times).all() and np.isfinite(data).all()):
+            raise ValueError("Cannot archive non-finite values")
+        if not len(times):
+            return
+        quantized = np.round(data / self.resolution)
+        if np.abs(quantized).max() > _VALUE_LIMIT:
+            raise ValueError(f"Values up to {np.abs(data).max():g} are out of range for resolution {self.resolution:g}")
+        steps = np.diff(quantized, axis=0, prepend=quantized[:1] if self._last is None else self._last[None])
+        if np.abs(steps).max() > _STEP_LIMIT:
+            raise ValueError(
+                f"Steps up to {np.abs(steps).max() * self.resolution:g} between samples are out of range "
+                f"for resolution {self.resolution:g} (max {_STEP_LIMIT * self.resolution:g})",
+            )
+        self._last = quantized[-1]
+        self._pending.append((times, data))
+        self._pending_samples += len(times)
+        while self._pending_samples >= self._block_samples:
+            self._flush(self._block_samples)
+
+    def close(self):
+        """Flush buffered samples and write the block index."""
+        if self._file.closed:
+            return
+        if self._pending_samples:
+            self._flush(self._pending_samples)
+        index_offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_FOOTER.pack(index_offset, INDEX_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush(self, n_samples):
+        import numpy as np
+
+        times = np.concatenate([t for t, _ in self._pending])
+        data = np.concatenate([d for _, d in self._pending])
+        rest_t, rest_d = times[n_samples:], data[n_samples:]
+        times, data = times[:n_samples], data[:n_samples]
+        self._pending = [(rest_t, rest_d)] if len(rest_t) else []
+        self._pending_samples = len(rest_t)
+
+        offsets = np.round((times - times[0]) * 1e6).astype(np.int64)
+        quantized = np.round(data / self.resolution).astype(np.int64)
+        # Channel-major so each channel's steps are contiguous for the compressor
+        # (write() has checked that every step fits in int32)
+        steps = np.diff(quantized.T, axis=1).astype("<i4")
+        payload = self._compress(
+            np.diff(offsets, prepend=0).astype("<i8").tobytes()
+            + quantized[0].astype("<i8").tobytes()
+            + steps.tobytes(),
+        )
+        t_start, t_end = float(times[0]), float(times[-1])
+        self._index.append((self._file.tell(), t_start, t_end, n_samples))
+        self._file.write(_BLOCK.pack(t_start, t_end, n_samples, len(payload)) + payload)
+        # Make the block visible to readers of a recording still being written
+        self._file.flush()
+
+
+class ArchiveReader:
+    """Random-access reader for archives written by ``ArchiveWriter``.
+
+    Attributes:
+        channels (list[str]): Channel names.
+        sfreq (float): Sampling frequency in Hz.
+        resolution (float): Quantization step.
+        blocks (list[tuple]): (offset, t_start, t_end, n_samples) per block.
+
+    """
+
+    def __init__(self, path):
+        """Open an archive and load its header and block index.
+
+        Raises:
+            ValueError: If the file is not an archive.
+
+        """
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not an EEG archive")
+        (header_len,) = _HEADER_LEN.unpack(self._file.read(_HEADER_LEN.size))
+        header = json.loads(self._file.read(header_len))
+        self._data_offset = self._file.tell()
+        self._version = header.get("version", 1)
+        self.channels = header["channels"]
+        self.sfreq = header["sfreq"]
+        self.resolution = header["resolution"]
+        self._decompress = CODECS[header["codec"]][1]
+        self.blocks = self._read_index()
+        self._starts = [b[1] for b in self.blocks]
+
+    def read(self, start=None, end=None):
+        """Decode the samples between two timestamps (inclusive).
+
+        Only the blocks overlapping [start, end] are decompressed.
+
+        Args:
+            start: Epoch seconds, or None for the beginning.
+            end: Epoch seconds, or None for the end.
+
+        Returns:
+            tuple: (times, data) with times of shape (n_samples,) and data
+            float64 of shape (n_samples, n_channels).
+
+        """
+        import numpy as np
+
+        start = -np.inf if start is None else start - _TIME_TOLERANCE
+        end = np.inf if end is None else end + _TIME_TOLERANCE
+        first = max(bisect.bisect_left(self._starts, start) - 1, 0)
+        times, data = [], []
+        for offset, t_start, t_end, n_samples in self.blocks[first:]:
+            if t_start > end:
+                break
+            if t_end < start:
+                continue
+            t, d = self._decode(offset, n_samples)
+            mask = (t >= start) & (t <= end)
+            times.append(t[mask])
+            data.append(d[mask])
+        if not times:
+            return np.empty(0), np.empty((0, len(self.channels)))
+        return np.concatenate(times), np.concatenate(data)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _decode(self, offset, n_samples):
+        import numpy as np
+
+        self._file.seek(offset)
+        t_start, _, _, payload_len = _BLOCK.unpack(self._file.read(_BLOCK.size))
+        raw = self._decompress(self._file.read(payload_len))
+        n_channels = len(self.channels)
+        split = n_samples * 8
+        offsets = np.cumsum(np.frombuffer(raw[:split], dtype="<i8"))
+        if self._version == 1:
+            # The first step of each channel was its full value
+            deltas = np.frombuffer(raw[split:], dtype="<i4").reshape(n_channels, n_samples)
+        else:
+            first = np.frombuffer(raw, dtype="<i8", count=n_channels, offset=split)
+            steps = np.frombuffer(raw[split + n_channels * 8:], dtype="<i4").reshape(n_channels, n_samples - 1)
+            deltas = np.column_stack((first, steps))
+        data = np.cumsum(deltas, axis=1, dtype=np.int64).T * self.resolution
+        return t_start + offsets / 1e6, data
+
+    def _read_index(self):
+        size = self._file.seek(0, os.SEEK_END)
+        if size >= self._data_offset + _FOOTER.size:
+            self._file.seek(size - _FOOTER.size)
+            index_offset, magic = _FOOTER.unpack(self._file.read(_FOOTER.size))
+            if magic == INDEX_MAGIC:
+                self._file.seek(index_offset)
+                raw = self._file.read(size - _FOOTER.size - index_offset)
+                return [entry for entry in _INDEX_ENTRY.iter_unpack(raw)]
+        # No index (writer not closed): walk the block headers
+        blocks = []
+        offset = self._data_offset
+        while offset + _BLOCK.size <= size:
+            self._file.seek(offset)
+            t_start, t_end, n_samples, payload_len = _BLOCK.unpack(self._file.read(_BLOCK.size))
+            if offset + _BLOCK.size + payload_len > size:
+                break
+            blocks.append((offset, t_start, t_end, n_samples))
+            offset += _BLOCK.size + payload_len
+        return blocks
+
+
+def convert_csv(src, dst=None, sfreq=250, **kwargs):
+    """Convert a snapshot CSV (as written by connector.py) to an archive.
+
+    All data columns are kept. Columns beyond the names in the header are
+    named ch<N>.
+
+    Args:
+        src: Snapshot CSV path.
+        dst: Archive path (defaults to ``src`` with the archive suffix).
+        sfreq: Sampling frequency in Hz.
+        **kwargs: Passed to ``ArchiveWriter``.
+
+    Returns:
+        str: The archive path.
+
+    """
+    import numpy as np
+
+    dst = dst or os.path.splitext(src)[0] + ARCHIVE_SUFFIX
+    with open(src) as f:
+        names = f.readline().strip().split(",")[1:]
+    arr = np.loadtxt(src, delimiter=",", skiprows=1, ndmin=2)
+    n_channels = arr.shape[1] - 1
+    channels = names[:n_channels] + [f"ch{i + 1}" for i in range(len(names), n_channels)]
+    with ArchiveWriter(dst, channels, sfreq, **kwargs) as writer:
+        writer.write(arr[:, 0], arr[:, 1:])
+    return dst
+
+
+def convert_fif(src, dst=None, **kwargs):
+    """Convert a FIF recording (as saved by connector.py) to an archive.
+
+    Requires mne (server extra). Timestamps start at the measurement date
+    if the file has one, otherwise at 0.
+
+    Args:
+        src: FIF file path.
+        dst: Archive path (defaults to ``src`` with the archive suffix).
+        **kwargs: Passed to ``ArchiveWriter``.
+
+    Returns:
+        str: The archive path.
+
+    """
+    import mne
+
+    dst = dst or os.path.splitext(src)[0] + ARCHIVE_SUFFIX
+    raw = mne.io.read_raw_fif(src, preload=True, verbose=False)
+    data, times = raw.get_data(return_times=True)
+    meas_date = raw.info["meas_date"]
+    t0 = meas_date.timestamp() if meas_date is not None else 0.0
+    with ArchiveWriter(dst, raw.ch_names, raw.info["sfreq"], **kwargs) as writer:
+        writer.write(times + t0, data.T)
+    return dst
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert and inspect EEG archives.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="Convert snapshot CSV or FIF files to archives.")
+    conv.add_argument("files", nargs="+")
+    conv.add_argument("--resolution", type=float, default=1e-3, help="Quantization step (recording units).")
+    conv.add_argument("--codec", choices=sorted(CODECS), default="zlib")
+    conv.add_argument("--block-seconds", type=float, default=10.0)
+    conv.add_argument("--sfreq", type=float, default=250, help="Sampling frequency of CSV files.")
+    info = sub.add_parser("info", help="Print archive header and block index summary.")
+    info.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    for path in args.files:
+        if args.command == "convert":
+            options = {"resolution": args.resolution, "codec": args.codec, "block_seconds": args.block_seconds}
+            if path.endswith(".fif"):
+                dst = convert_fif(path, **options)
+            else:
+                dst = convert_csv(path, sfreq=args.sfreq, **options)
+            ratio = os.path.getsize(path) / os.path.getsize(dst)
+            print(f"{path} -> {dst} ({ratio:.1f}x smaller)")
+        else:
+            with ArchiveReader(path) as reader:
+                n_samples = sum(b[3] for b in reader.blocks)
+                span = (reader.blocks[-1][2] - reader.blocks[0][1]) if reader.blocks else 0.0
+                print(
+                    f"{path}: {len(reader.channels)} channels @ {reader.sfreq:g} Hz, "
+                    f"{n_samples} samples, {len(reader.blocks)} blocks, {span:.1f} s, "
+                    f"resolution {reader.resolution:g}",
+                )
+
+
+if __name__ == "__main__":
+    main()
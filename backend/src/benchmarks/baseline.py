@@ -0,0 +1,107 @@
+"""Timing and consistency check of the batch Pomodoro baseline.
+
+Simulates a connector session with the load test's synthetic headset:
+raw chunks of ``CHUNK_SECONDS`` are preprocessed and archived to
+``*-recording.eegz`` as connector.py does (the archive is left open, as
+while the connector is running), and the raw signal is also saved as
+``*-raw.fif`` (needs mne). Then, for each recording:
+
+- ``PomodoroSession.load_baseline`` is timed on it;
+- its readings are compared with the live path: the same chunks
+  replayed through a ``MetricsPipeline`` with a ``mean_metrics()``
+  reading every minute, like ``collect_baseline``.
+
+Usage (from the backend directory):
+    python -m src.benchmarks.baseline --minutes 15
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.models.baseline import CHUNK_SECONDS, STEP_SECONDS
+
+
+def make_session(data_dir, minutes, sfreq):
+    """Write the recordings of a synthetic session; return its preprocessed chunks."""
+    from src.archive import ArchiveWriter
+    from src.benchmarks.loadtest import CHANNELS, SyntheticFeed
+    from src.preprocessing import design_filters, preprocess_chunk
+
+    feed = SyntheticFeed(data_dir, interval=CHUNK_SECONDS, sfreq=sfreq)
+    filters = design_filters(sfreq)
+    t0 = time.time() - minutes * 60
+    recorder = ArchiveWriter(os.path.join(data_dir, "session-recording.eegz"), CHANNELS, sfreq)
+    raw, chunks = [], []
+    for i in range(int(minutes * 60 / CHUNK_SECONDS)):
+        times, data = feed.make_chunk(t0 + i * CHUNK_SECONDS)
+        raw.append(data.copy())
+        clean = preprocess_chunk(data, filters, inplace=True)
+        recorder.write(times, clean.T)
+        chunks.append((times, clean.T))
+    try:
+        import mne
+    except ImportError:
+        print("mne not installed, skipping the FIF recording")
+    else:
+        info = mne.create_info(list(CHANNELS), sfreq, ch_types="eeg")
+        mne.io.RawArray(np.hstack(raw), info, verbose=False).save(
+            os.path.join(data_dir, "session-raw.fif"), verbose=False,
+        )
+    return chunks
+
+
+def live_readings(chunks, count):
+    """Replay chunks through a fresh pipeline, reading mean_metrics() every minute."""
+    from src.models.metrics_buffer import MetricsPipeline
+    from src.models.montage import get_montage
+
+    columns = get_montage().columns - 1
+    per_minute = int(STEP_SECONDS / CHUNK_SECONDS)
+    pipeline = MetricsPipeline()
+    focus, tiredness = [], []
+    for i, (times, eeg) in enumerate(chunks, 1):
+        pipeline.ingest(times, np.ascontiguousarray(eeg[:, columns]))
+        if i % per_minute == 0:
+            metrics = pipeline.mean_metrics()
+            focus.append(metrics["focus_level"])
+            tiredness.append(metrics["tiredness_level"])
+    return focus[-count:], tiredness[-count:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time the batch Pomodoro baseline.")
+    parser.add_argument("--minutes", type=float, default=15.0, help="Length of the synthetic session.")
+    parser.add_argument("--baseline-minutes", type=int, default=10, help="Readings in the baseline.")
+    args = parser.parse_args()
+
+    from src.models.baseline import recent_recordings
+    from src.models.metrics_buffer import SFREQ
+    from src.models.pomodoro_model import PomodoroSession
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks = make_session(tmp, args.minutes, SFREQ)
+        focus, tiredness = live_readings(chunks, args.baseline_minutes)
+        print(f"live baseline: focus={int(np.mean(focus))}, tiredness={int(np.mean(tiredness))}")
+        for path in recent_recordings(tmp):
+            session = PomodoroSession(min_baseline_minutes=args.baseline_minutes)
+            start = time.perf_counter()
+            unlocked = session.load_baseline([path])
+            elapsed = time.perf_counter() - start
+            print(f"{os.path.basename(path)}: load_baseline {elapsed * 1000:.0f} ms, unlocked={unlocked}")
+            if not unlocked:
+                continue
+            print(f"  batch baseline: focus={session.baseline_focus_val}, tiredness={session.baseline_tiredness_val}")
+            for name, batch, live in (
+                ("focus", session.baseline_focus, focus),
+                ("tiredness", session.baseline_tiredness, tiredness),
+            ):
+                diff = np.abs(np.array(batch) - np.array(live))
+                print(f"  {name:<10} readings max difference {diff.max()} points (mean {diff.mean():.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Numerical-accuracy check of the float32 data path.
+
+Runs stored recordings through the full pipeline twice, in float64 and
+in float32: preprocessing, snapshot file round-trip, band powers and the
+models. Each recording is cut into chunks as the backend would ingest
+them and fed to a fresh ``MetricsPipeline``; after every chunk both the
+chunk's levels and the ``mean_metrics()`` levels (over the whole EEG
+buffer) are compared. Exits with status 1 if any level differs by more
+than ``--tolerance`` points.
+
+By default every snapshot in the data directory is checked with the
+active montage, and the mock recordings in ``data/eeg_recordings`` with
+the "mock" montage.
+
+Usage (from the backend directory):
+    python -m src.benchmarks.dtype_accuracy
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from src.models.metrics_buffer import DATA_DIR, SFREQ, MetricsPipeline
+from src.models.montage import DEFAULT_PRESET, get_montage
+from src.preprocessing import design_filters, preprocess_chunk
+from src.snapshots import read_snapshot, write_snapshot
+
+# Recordings of the mock recorder, read with the "mock" montage
+MOCK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "eeg_recordings")
+
+LEVELS = ("focus_level", "stress_level", "tiredness_level")
+
+
+def use_montage(spec):
+    """Make ``spec`` the montage returned by ``get_montage``."""
+    os.environ["HOTB_MONTAGE"] = spec
+    get_montage.cache_clear()
+
+
+def pipeline_levels(times, eeg, dtype, chunk_seconds):
+    """Return (chunk, mean) levels for one dtype, each of shape (n_chunks, 3)."""
+    filters = design_filters(SFREQ, dtype)
+    pipeline = MetricsPipeline()
+    step = int(chunk_seconds * SFREQ)
+    header = "time," + ",".join(get_montage().channels)
+    columns = np.arange(1, eeg.shape[1] + 1)
+    chunk, mean = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chunk-snapshot.csv")
+        for start in range(0, eeg.shape[0] - step + 1, step):
+            clean = preprocess_chunk(eeg[start:start + step].T, filters)
+            write_snapshot(path, times[start:start + step], clean, header)
+            stored_times, stored = read_snapshot(path, columns, dtype)
+            pipeline.ingest(stored_times, stored)
+            chunk.append([pipeline.latest[name] for name in LEVELS])
+            metrics = pipeline.mean_metrics()
+            mean.append([metrics[name] for name in LEVELS])
+    return np.array(chunk), np.array(mean)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare float32 and float64 metric levels.")
+    parser.add_argument(
+        "files", nargs="*",
+        help="Snapshot CSVs, read with the active montage (default: the data directory and the mock recordings).",
+    )
+    parser.add_argument("--chunk-seconds", type=float, default=1.0, help="Length of an ingested chunk.")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Allowed difference in level points.")
+    args = parser.parse_args()
+
+    active = os.environ.get("HOTB_MONTAGE", DEFAULT_PRESET)
+    if args.files:
+        recordings = [(path, active) for path in args.files]
+    else:
+        recordings = [(path, active) for path in sorted(glob.glob(os.path.join(DATA_DIR, "*-snapshot.csv")))]
+        recordings += [(path, "mock") for path in sorted(glob.glob(os.path.join(MOCK_DIR, "*.csv")))]
+    worst = 0
+    for path, montage in recordings:
+        use_montage(montage)
+        times, eeg = read_snapshot(path, get_montage().columns, "float64")
+        ref = pipeline_levels(times, eeg, np.float64, args.chunk_seconds)
+        low = pipeline_levels(times, eeg, np.float32, args.chunk_seconds)
+        if len(ref[0]) == 0:
+            print(f"{os.path.basename(path)}: shorter than one chunk, skipped")
+            continue
+        chunk_diff, mean_diff = (int(np.abs(r - l).max()) for r, l in zip(ref, low))
+        worst = max(worst, chunk_diff, mean_diff)
+        print(
+            f"{os.path.basename(path)} ({montage} montage): {len(ref[0])} chunks, "
+            f"max level difference {chunk_diff} per chunk, {mean_diff} in mean_metrics",
+        )
+    use_montage(active)
+    if worst > args.tolerance:
+        print(f"FAIL: float32 differs by {worst} points (tolerance {args.tolerance})")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
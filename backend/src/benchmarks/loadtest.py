@@ -0,0 +1,181 @@
+"""HTTP load test for the metrics API with a simulated headset.
+
+A synthetic feed writes snapshot CSVs in the format connector.py
+produces (preprocessed 8-channel EEG with alpha/beta/theta activity),
+while many async clients poll ``/api/current``, ``/api/mean_metrics`` and
+``/api/history``. The report lists throughput, p50/p95/p99 latency and
+error counts per endpoint.
+
+By default the app runs in-process (no server needed) and the feed
+writes to a temporary directory. With ``--url`` the clients hit a
+running backend instead; point ``--data-dir`` at its BrainAccessData
+directory so the feed drives it.
+
+Requires httpx (``uv sync --extra loadtest``).
+
+Usage (from the backend directory):
+    python -m src.benchmarks.loadtest --clients 50 --duration 30
+    python -m src.benchmarks.loadtest --url http://localhost:8000 --data-dir BrainAccessData
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ENDPOINTS = ("/api/current", "/api/mean_metrics", "/api/history")
+
+# Electrode names written to the snapshot header, as in connector.py
+CHANNELS = ("F3", "F4", "C3", "C4", "P3", "P4", "O1", "O2")
+
+
+class SyntheticFeed(threading.Thread):
+    """Write a new snapshot every ``interval`` seconds, like connector.py.
+
+    The signal is a mix of theta (6 Hz), alpha (10 Hz) and beta (20 Hz)
+    oscillations whose amplitudes drift slowly, plus noise and 50 Hz
+    mains hum, passed through the connector's preprocessing.
+    """
+
+    def __init__(self, data_dir, interval=3.0, sfreq=250, seed=0):
+        super().__init__(daemon=True)
+        self.data_dir = data_dir
+        self.interval = interval
+        self.sfreq = sfreq
+        self.chunks = 0
+        self._rng = np.random.default_rng(seed)
+        self._stopped = threading.Event()
+        self._path = os.path.join(data_dir, f'{time.strftime("%Y%m%d_%H%M")}-loadtest-snapshot.csv')
+
+    def make_chunk(self, t0):
+        """Return (times, data) for ``interval`` seconds starting at ``t0``."""
+        n = int(self.interval * self.sfreq)
+        t = np.arange(n) / self.sfreq
+        drift = 1.0 + 0.5 * np.sin(2 * np.pi * (t0 % 120) / 120)
+        data = np.empty((len(CHANNELS), n))
+        for ch in range(len(CHANNELS)):
+            phase = self._rng.uniform(0, 2 * np.pi, 3)
+            data[ch] = (
+                3.0 * drift * np.sin(2 * np.pi * 6 * t + phase[0])
+                + 5.0 / drift * np.sin(2 * np.pi * 10 * t + phase[1])
+                + 2.0 * drift * np.sin(2 * np.pi * 20 * t + phase[2])
+                + 4.0 * np.sin(2 * np.pi * 50 * t)
+                + self._rng.normal(0, 1.5, n)
+            )
+        return t0 + t, data
+
+    def run(self):
+        from src.preprocessing import design_filters, preprocess_chunk
+        from src.snapshots import write_snapshot
+
+        filters = design_filters(self.sfreq)
+        header = "time," + ",".join(CHANNELS)
+        while not self._stopped.is_set():
+            times, data = self.make_chunk(time.time())
+            write_snapshot(self._path, times, preprocess_chunk(data, filters, inplace=True), header)
+            self.chunks += 1
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+
+
+async def client(http, endpoints, interval, deadline, use_etag, results):
+    """Poll ``endpoints`` round-robin until ``deadline``, recording latencies."""
+    etags = {}
+    i = 0
+    while time.perf_counter() < deadline:
+        endpoint = endpoints[i % len(endpoints)]
+        i += 1
+        headers = {"If-None-Match": etags[endpoint]} if use_etag and endpoint in etags else {}
+        start = time.perf_counter()
+        try:
+            response = await http.get(endpoint, headers=headers)
+            ok = response.status_code in (200, 304, 404)
+            if "etag" in response.headers:
+                etags[endpoint] = response.headers["etag"]
+        except Exception:
+            ok = False
+        results[endpoint].append((time.perf_counter() - start, ok))
+        if interval:
+            await asyncio.sleep(interval)
+
+
+async def run(args, transport=None):
+    import httpx
+
+    results = {e: [] for e in args.endpoints}
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(
+        base_url=args.url or "http://loadtest", transport=transport, limits=limits, timeout=30.0,
+    ) as http:
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client(http, args.endpoints, args.interval, deadline, args.etag, results)
+            for _ in range(args.clients)
+        ))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def report(results, elapsed, feed):
+    """Print throughput, latency percentiles and errors per endpoint."""
+    print(f"{'endpoint':<20}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    total = 0
+    for endpoint, samples in results.items():
+        if not samples:
+            continue
+        latencies = np.array([s[0] for s in samples]) * 1000
+        errors = sum(1 for s in samples if not s[1])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        total += len(samples)
+        print(
+            f"{endpoint:<20}{len(samples):>10}{len(samples) / elapsed:>10.1f}"
+            f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{errors:>8}",
+        )
+    print(f"total: {total} requests in {elapsed:.1f} s ({total / elapsed:.1f} req/s), {feed.chunks} chunks fed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the metrics API with a synthetic EEG feed.")
+    parser.add_argument("--clients", type=int, default=20, help="Number of concurrent clients.")
+    parser.add_argument("--duration", type=float, default=20.0, help="Test length in seconds.")
+    parser.add_argument("--interval", type=float, default=0.5, help="Pause between a client's requests (0 = no pause).")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), help="Endpoints to poll.")
+    parser.add_argument("--etag", action="store_true", help="Send If-None-Match with the last ETag.")
+    parser.add_argument("--feed-interval", type=float, default=3.0, help="Seconds between snapshots.")
+    parser.add_argument("--url", help="Base URL of a running backend (default: in-process app).")
+    parser.add_argument("--data-dir", help="Directory the feed writes to (default: temporary).")
+    args = parser.parse_args()
+
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("httpx is required for the load test: uv sync --extra loadtest")
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="hotb-loadtest-")
+    transport = None
+    if not args.url:
+        # The app reads HOTB_DATA_DIR on import
+        os.environ["HOTB_DATA_DIR"] = data_dir
+        from src.main import app
+
+        transport = httpx.ASGITransport(app=app)
+
+    feed = SyntheticFeed(data_dir, interval=args.feed_interval)
+    feed.start()
+    try:
+        results, elapsed = asyncio.run(run(args, transport))
+    finally:
+        feed.stop()
+        feed.join()
+    report(results, elapsed, feed)
+
+
+if __name__ == "__main__":
+    main()
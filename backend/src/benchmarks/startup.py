@@ -0,0 +1,62 @@
+"""Startup-time benchmark for the backend.
+
+Each run starts a fresh interpreter and measures:
+  * import: time to import ``src.main`` (what uvicorn does before serving)
+  * warmup: time of the filter warm-up (normally run in the background)
+  * first_current: time of the first ``/api/current`` computation
+
+Usage (from the backend directory):
+    python -m src.benchmarks.startup --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_CHILD = """
+import json, time
+t0 = time.perf_counter()
+import src.main
+t1 = time.perf_counter()
+warmup = 0.0
+if {warmup}:
+    from src.models.metrics_buffer import SFREQ, warmup_filters
+    warmup_filters((SFREQ,))
+    warmup = time.perf_counter() - t1
+t2 = time.perf_counter()
+from src.state import get_state
+state = get_state()
+state.version("current")
+state.current()
+t3 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "warmup": warmup, "first_current": t3 - t2}}))
+"""
+
+
+def run_once(warmup: bool) -> dict:
+    """Run one cold start in a subprocess and return its timings (seconds)."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(warmup=warmup)],
+        cwd=backend_dir, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure backend cold-start time.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of cold starts.")
+    parser.add_argument("--warmup", action="store_true", help="Run the filter warm-up before the first request.")
+    args = parser.parse_args()
+
+    runs = [run_once(args.warmup) for _ in range(args.repeat)]
+    for key in ("import", "warmup", "first_current"):
+        values = [r[key] for r in runs]
+        print(f"{key:>14}: median {statistics.median(values) * 1000:8.1f} ms  min {min(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,27 @@
 """EEG measurement example
 Infinite Loop: Runs until Ctrl+C is pressed.
 Saves CSV Snapshot every 1s.
+
+The preprocessed stream is also archived to ``*-recording.eegz`` (see
+``src.archive``), which the Pomodoro baseline reads back.
+
+With ``HOTB_INGEST_URL`` set (e.g. ``http://192.168.1.10:8000``) every
+chunk is also streamed to that backend, filed under ``HOTB_DEVICE_ID``
+(default: the device name with spaces replaced by dashes).
 """
 
 import logging
 import os
 import time
 
-import matplotlib
-import matplotlib.pyplot as plt
 import numpy as np
 from brainaccess.core.eeg_manager import EEGManager
 from brainaccess.utils import acquisition
-from scipy.signal import butter, sosfiltfilt
 
-matplotlib.use("TKAgg", force=True)
+from src.archive import ArchiveWriter
+from src.ingest_protocol import ChunkUploader
+from src.preprocessing import design_filters, get_dtype, preprocess_chunk
+from src.snapshots import write_snapshot
 
 # --- Setup ---
 eeg = acquisition.EEG()
@@ -28,77 +35,11 @@ device_name = "BA MINI 049"
 
 os.makedirs("./BrainAccessData", exist_ok=True)
 csv_filename = f'./BrainAccessData/{time.strftime("%Y%m%d_%H%M")}-snapshot.csv'
+recording_filename = f'./BrainAccessData/{time.strftime("%Y%m%d_%H%M")}-recording.eegz'
 header_str = "time," + ",".join(cap.values())
 
-
-def butter_bandpass(lowcut, highcut, fs, order=2):
-    """Butterworth bandpass filter design."""
-    nyq = 0.5 * fs
-    low = lowcut / nyq
-    high = highcut / nyq
-    sos = butter(order, [low, high], analog=False, btype="bandpass", output="sos")
-    return sos
-
-
-def design_filters(sfreq):
-    """Design bandpass (1-40Hz) and notch (50Hz) filters.
-    
-    Args:
-        sfreq: Sampling frequency in Hz
-    
-    Returns:
-        dict: Contains 'bandpass_sos' and 'notch_sos' filter coefficients
-
-    """
-    # Bandpass filter: 1-40 Hz
-    bandpass_sos = butter_bandpass(1, 40, sfreq, order=2)
-
-    # Notch filter: 50 Hz
-    nyq = 0.5 * sfreq
-    notch_freq = 50 / nyq
-    notch_sos = butter(2, [notch_freq - 0.01, notch_freq + 0.01],
-                       analog=False, btype="bandstop", output="sos")
-
-    return {
-        "bandpass_sos": bandpass_sos,
-        "notch_sos": notch_sos,
-    }
-
-def preprocess_chunk(chunk, filter_state):
-    """Preprocesses a chunk of EEG data.
-    Steps:
-      1. Remove mean from each channel
-      2. Bandpass filter (1-40 Hz)
-      3. Notch filter (50 Hz)
-      4. Average reference (re-referencing)
-
-    Args:
-        chunk: np.ndarray, shape (n_channels, n_samples)
-        filter_state: dict with 'bandpass_sos' and 'notch_sos'
-    Returns:
-        chunk_clean: np.ndarray, shape (n_channels, n_samples)
-
-    """
-    import numpy as np
-
-    # 1. Remove mean from each channel
-    chunk_demean = chunk - np.mean(chunk, axis=1, keepdims=True)
-
-    # 2. Bandpass filter
-    chunk_band = np.zeros_like(chunk_demean)
-    for ch in range(chunk.shape[0]):
-        chunk_band[ch] = sosfiltfilt(filter_state["bandpass_sos"], chunk_demean[ch])
-
-    # 3. Notch filter
-    chunk_notch = np.zeros_like(chunk_band)
-    for ch in range(chunk.shape[0]):
-        chunk_notch[ch] = sosfiltfilt(filter_state["notch_sos"], chunk_band[ch])
-
-    # 4. Average reference (re-referencing)
-    avg = np.mean(chunk_notch, axis=0, keepdims=True)
-    chunk_clean = chunk_notch - avg
-
-    return chunk_clean
+ingest_url = os.environ.get("HOTB_INGEST_URL")
+device_id = os.environ.get("HOTB_DEVICE_ID", device_name.replace(" ", "-"))
 
 
 if __name__ == "__main__":
@@ -109,10 +50,17 @@ if __name__ == "__main__":
 
     # --- Przygotuj filtry ---
     sfreq = 250
-    filters = design_filters(sfreq)
-    bandpass_sos = filters["bandpass_sos"]
-    notch_sos = filters["notch_sos"]
-    logger.info("Filters loaded: Bandpass (1-40Hz) and Notch (50Hz)")
+    dtype = get_dtype()
+    filters = design_filters(sfreq, dtype)
+    logger.info("Filters loaded: Bandpass (1-40Hz) and Notch (50Hz), dtype %s", dtype)
+
+    uploader = None
+    if ingest_url:
+        uploader = ChunkUploader(ingest_url, device_id, sfreq)
+        logger.info("Streaming chunks to %s", uploader.url)
+
+    # Created with the first chunk, once the number of recorded channels is known
+    recorder = None
 
     # --- Start ---
     with EEGManager() as mgr:
@@ -153,16 +101,27 @@ if __name__ == "__main__":
                         current_len = d.shape[1]
 
                         if current_len > last_idx:
-                            new_data = d[:, last_idx:]
+                            # Single copy in the pipeline dtype, filtered in place
+                            new_data = np.array(d[:, last_idx:], dtype=dtype)
                             new_times = t[last_idx:] + acquisition_start_time
 
                             # Przetwarzanie 'w locie' za pomocą preprocess_chunk
-                            filtered_data = preprocess_chunk(new_data, filters)
-                            chunk_to_save = np.vstack((new_times, filtered_data)).T
+                            filtered_data = preprocess_chunk(new_data, filters, inplace=True)
 
                             if annotation >= 2:
-                                with open(csv_filename, "w") as f:
-                                    np.savetxt(f, chunk_to_save, delimiter=",", header=header_str, comments="")
+                                write_snapshot(csv_filename, new_times, filtered_data, header_str)
+                                if recorder is None:
+                                    # Channels beyond the cap (e.g. accelerometer) are named ch<N>, as in src.archive
+                                    names = list(cap.values())
+                                    names += [f"ch{i + 1}" for i in range(len(names), filtered_data.shape[0])]
+                                    recorder = ArchiveWriter(recording_filename, names, sfreq)
+                                    logger.info("Preprocessed stream archived to: %s", recording_filename)
+                                try:
+                                    recorder.write(new_times, filtered_data.T)
+                                except ValueError as exc:
+                                    logger.warning("Chunk not archived: %s", exc)
+                                if uploader is not None:
+                                    uploader.send(new_times, filtered_data)
 
                                 logger.info("Filtered and saved %d samples.", new_data.shape[1])
                             last_idx = current_len
@@ -176,6 +135,8 @@ if __name__ == "__main__":
             logger.info("\n\n!!! STOPPING (Ctrl+C detected) !!!")
 
         logger.info("Closing connection...")
+        if recorder is not None:
+            recorder.close()
         eeg.stop_acquisition()
         mgr.disconnect()
 
@@ -187,6 +148,11 @@ if __name__ == "__main__":
     logger.info("Plotting...")
     mne_raw = eeg.data.mne_raw
     if mne_raw is not None:
+        # Plotting only happens after Ctrl+C, so the GUI backend is loaded here
+        import matplotlib
+        matplotlib.use("TKAgg", force=True)
+        import matplotlib.pyplot as plt
+
         mne_raw.apply_function(lambda x: x*10**-6)
         mne_raw.filter(1, 40).plot(scalings="auto", verbose=False)
         plt.show()
@@ -0,0 +1,180 @@
+"""Binary framing for streaming EEG chunks to the backend over HTTP.
+
+A connector POSTs one or more frames, concatenated, to
+``/api/ingest/{device_id}``. Each frame is a fixed little-endian header
+followed by the samples as little-endian float32, sample-major (one row
+of ``n_channels`` values per sample, in cap order)::
+
+    magic    4s   b"HOTB"
+    version  u8   FRAME_VERSION
+    flags    u8   reserved, 0
+    n_ch     u16  number of channels
+    stream   u32  random id of the sending connector run
+    seq      u32  frame number within the stream, starting at 0
+    n        u32  number of samples
+    t0       f64  epoch seconds of the first sample
+    sfreq    f32  sampling frequency in Hz
+
+The server answers each POST with one acknowledgement carrying the
+highest sequence number it has taken; the connector drops frames up to
+that number and resends the rest with the next batch. Frames the server
+has already seen are ignored, so resending is always safe.
+"""
+
+import logging
+import struct
+from collections import deque, namedtuple
+
+FRAME_MAGIC = b"HOTB"
+FRAME_VERSION = 1
+_HEADER = struct.Struct("<4sBBHIIIdf")
+
+# Decoded frame; data is a read-only float32 view, shape (n_samples, n_channels)
+Frame = namedtuple("Frame", ("stream", "seq", "t0", "sfreq", "data"))
+
+
+def encode_frame(stream, seq, t0, sfreq, data):
+    """Encode one chunk as a frame.
+
+    Args:
+        stream: Id of the sending connector run (u32).
+        seq: Frame number within the stream (u32).
+        t0: Epoch seconds of the first sample.
+        sfreq: Sampling frequency in Hz.
+        data: np.ndarray, shape (n_channels, n_samples).
+
+    Returns:
+        bytes: Header and float32 payload.
+
+    """
+    import numpy as np
+
+    payload = np.ascontiguousarray(data.T, dtype="<f4")
+    n_samples, n_channels = payload.shape
+    header = _HEADER.pack(FRAME_MAGIC, FRAME_VERSION, 0, n_channels, stream, seq, n_samples, t0, sfreq)
+    return header + payload.tobytes()
+
+
+def decode_frames(body):
+    """Split a request body into frames.
+
+    Args:
+        body: Concatenated frames.
+
+    Returns:
+        list[Frame]: Frames in the order they were sent.
+
+    Raises:
+        ValueError: If the body is truncated, a header is invalid or a
+            sample is not finite.
+
+    """
+    import numpy as np
+
+    frames = []
+    offset = 0
+    while offset < len(body):
+        if len(body) - offset < _HEADER.size:
+            raise ValueError(f"Truncated frame header at byte {offset}")
+        magic, version, _flags, n_channels, stream, seq, n_samples, t0, sfreq = _HEADER.unpack_from(body, offset)
+        if magic != FRAME_MAGIC:
+            raise ValueError(f"Bad frame magic at byte {offset}")
+        if version != FRAME_VERSION:
+            raise ValueError(f"Unsupported frame version {version}")
+        if n_channels == 0 or not sfreq > 0 or not np.isfinite(t0):
+            raise ValueError(f"Invalid frame {seq}: {n_channels} channels, sfreq {sfreq}, t0 {t0}")
+        offset += _HEADER.size
+        size = n_samples * n_channels * 4
+        if len(body) - offset < size:
+            raise ValueError(f"Truncated payload of frame {seq}")
+        data = np.frombuffer(body, dtype="<f4", count=n_samples * n_channels, offset=offset)
+        if not np.isfinite(data).all():
+            raise ValueError(f"Frame {seq} has non-finite samples")
+        frames.append(Frame(stream, seq, t0, float(sfreq), data.reshape(n_samples, n_channels)))
+        offset += size
+    return frames
+
+
+class ChunkUploader:
+    """Send preprocessed chunks to a remote backend.
+
+    Chunks are queued as frames and every ``send`` POSTs all frames not
+    acknowledged yet, so a chunk lost to a network error goes out again
+    with the next one. At most ``max_pending`` frames are kept; the
+    oldest are dropped when the backend stays unreachable.
+
+    Attributes:
+        url (str): Ingest URL, ``.../api/ingest/{device_id}``.
+        stream (int): Random id of this connector run.
+
+    """
+
+    def __init__(self, base_url, device_id, sfreq, max_pending=100, timeout=2.0):
+        """Create an uploader.
+
+        Args:
+            base_url: Backend URL, e.g. ``http://192.168.1.10:8000``.
+            device_id: Name the backend files this headset's data under.
+            sfreq: Sampling frequency in Hz.
+            max_pending: Unacknowledged frames to keep for resending.
+            timeout: HTTP timeout in seconds.
+
+        """
+        import secrets
+        from urllib.parse import quote
+
+        self.url = f"{base_url.rstrip('/')}/api/ingest/{quote(device_id, safe='')}"
+        self.stream = secrets.randbits(32)
+        self.sfreq = sfreq
+        self.timeout = timeout
+        self._seq = 0
+        self._pending = deque(maxlen=max_pending)
+
+    def send(self, times, data):
+        """Queue a chunk and upload every unacknowledged frame.
+
+        A chunk with non-finite values is not sent. A batch the backend
+        refuses as malformed (4xx) is dropped, since resending it cannot
+        succeed; one refused because the backend is serving too many
+        devices (429) is kept and retried.
+
+        Args:
+            times: np.ndarray, shape (n_samples,), epoch seconds.
+            data: np.ndarray, shape (n_channels, n_samples).
+
+        Returns:
+            bool: True if the backend acknowledged all queued frames.
+
+        """
+        import numpy as np
+        import requests
+
+        log = logging.getLogger(__name__)
+        if not (np.isfinite(times[0]) and np.isfinite(data).all()):
+            log.warning("Not sending chunk with non-finite values")
+            return not self._pending
+        self._pending.append((self._seq, encode_frame(self.stream, self._seq, times[0], self.sfreq, data)))
+        self._seq += 1
+        try:
+            response = requests.post(
+                self.url,
+                data=b"".join(frame for _, frame in self._pending),
+                headers={"Content-Type": "application/octet-stream"},
+                timeout=self.timeout,
+            )
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                log.warning(
+                    "Backend refused %d frames (%d): %s", len(self._pending), response.status_code, response.text,
+                )
+                self._pending.clear()
+                return False
+            response.raise_for_status()
+            ack = response.json()["ack"]
+        except (requests.RequestException, KeyError, ValueError) as exc:
+            log.warning(
+                "Upload to %s failed (%d frames pending): %s", self.url, len(self._pending), exc,
+            )
+            return False
+        while self._pending and self._pending[0][0] <= ack:
+            self._pending.popleft()
+        return not self._pending
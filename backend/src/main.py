@@ -1,10 +1,48 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import the API router created in the project
+from src.api.ingest_routes import router as ingest_router
 from src.api.mental_metric_routes import router as metrics_router
+from src.models.metrics_buffer import SFREQ
+from src.state import get_state
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the optional filter warm-up without delaying readiness.
+
+    ``HOTB_WARMUP_SFREQS`` is a comma separated list of sampling rates to
+    precompute filters for (default: the headset rate). Set it to an empty
+    string to disable the warm-up.
+
+    Warns when the app looks like one of several uvicorn workers started
+    without the shared state server (``uvicorn --workers N`` instead of
+    ``python -m src.main --workers N``): each worker would then keep its
+    own EEG buffer and config.
+    """
+    import logging
+    import multiprocessing
+
+    from src.state import STATE_ADDRESS_ENV
+
+    several_workers = int(os.environ.get("WEB_CONCURRENCY", "1")) > 1 or multiprocessing.parent_process() is not None
+    if several_workers and not os.environ.get(STATE_ADDRESS_ENV):
+        logging.getLogger(__name__).warning(
+            "Started as a worker process without a state server: if uvicorn runs several workers, "
+            "each has its own state. Use 'python -m src.main --workers N' instead.",
+        )
+    sfreqs = os.environ.get("HOTB_WARMUP_SFREQS", str(SFREQ))
+    sfreqs = [float(f) for f in sfreqs.split(",") if f.strip()]
+    if sfreqs:
+        get_state().warmup(sfreqs)
+    yield
 
-app = FastAPI(title="heroes-of-the-brain - backend")
+
+app = FastAPI(title="heroes-of-the-brain - backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,9 +50,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 app.include_router(metrics_router, prefix="/api")
+app.include_router(ingest_router, prefix="/api")
 
 
 @app.get("/health")
@@ -23,11 +63,37 @@ async def health_check():
     return {"status": "ok"}
 
 
-def main() -> None:
+def main(workers: int | None = None) -> None:
+    """Run the API server.
+
+    With more than one worker, a shared state server is started first so
+    that all workers read the same EEG buffer and config (see ``src.state``).
+
+    Args:
+        workers: Number of uvicorn worker processes. Defaults to the
+            ``WEB_CONCURRENCY`` environment variable, or 1.
+
+    """
     import uvicorn
 
-    uvicorn.run("src.main:app", host="0.0.0.0", port=8000, log_level="info")
+    if workers is None:
+        workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    if workers <= 1:
+        uvicorn.run("src.main:app", host="0.0.0.0", port=8000, log_level="info")
+        return
+
+    from src.state import start_state_server, stop_state_server
+
+    state_server = start_state_server()
+    try:
+        uvicorn.run("src.main:app", host="0.0.0.0", port=8000, log_level="info", workers=workers)
+    finally:
+        stop_state_server(state_server)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the heroes-of-the-brain backend.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of uvicorn workers.")
+    main(parser.parse_args().workers)
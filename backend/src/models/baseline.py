@@ -0,0 +1,180 @@
+"""
+Pomodoro baseline from stored recordings.
+
+``PomodoroSession.collect_baseline`` samples ``mean_metrics()`` once a
+minute, each time over the EEG buffer (the last BUFFER_CHUNKS chunks),
+so the live baseline takes ``min_baseline_minutes`` minutes. When recordings of the same day
+are on disk, the same readings can be computed from them at once: every
+recording is band filtered once, and all buffer-length windows ending on
+a minute mark are evaluated together from a cumulative sum of the squared
+signal.
+
+Recordings are read from BrainAccessData:
+
+- ``*-recording.eegz``: the preprocessed stream connector.py archives
+  while it runs (readable while it is still being written);
+- ``*-raw.fif`` (and archives converted from them, ``*-raw.eegz``): raw
+  signal, run through ``preprocess_chunk`` in connector-sized chunks on
+  load so the readings match the live ones. Reading FIF needs mne.
+
+Snapshot CSVs only hold the last few seconds and are not used.
+"""
+
+import glob
+import logging
+import os
+
+from src.models.features import FeatureGraph, model_features, windowed_band_powers
+from src.models.focus_model import FocusModel
+from src.models.metrics_buffer import BUFFER_CHUNKS, DATA_DIR
+from src.models.montage import get_montage
+from src.models.tiredness_model import TirednessModel
+
+# Length of the chunks connector.py preprocesses (its save interval)
+CHUNK_SECONDS = 3.0
+# Span of one reading: the EEG buffer mean_metrics() averages over
+WINDOW_SECONDS = BUFFER_CHUNKS * CHUNK_SECONDS
+# Time between readings: collect_baseline runs once a minute
+STEP_SECONDS = 60
+
+RECORDING_PATTERNS = ("*-recording.eegz", "*-raw.eegz", "*-raw.fif")
+
+
+def recent_recordings(data_dir=DATA_DIR, since=None):
+    """
+    Return recordings modified since a given time, newest first.
+    An archive replaces the FIF file it was converted from.
+    Args:
+        data_dir: directory to search
+        since: epoch seconds; defaults to local midnight (today's recordings)
+    Returns:
+        list[str]: paths
+    """
+    import time
+    if since is None:
+        since = time.mktime(time.localtime()[:3] + (0, 0, 0, 0, 0, -1))
+    paths = {}
+    for pattern in reversed(RECORDING_PATTERNS):
+        for path in glob.glob(os.path.join(data_dir, pattern)):
+            paths[os.path.splitext(path)[0]] = path
+    recordings = []
+    for path in paths.values():
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        if mtime >= since:
+            recordings.append((mtime, path))
+    return [path for _, path in sorted(recordings, reverse=True)]
+
+
+def _preprocess(data, sfreq):
+    # Same steps and chunking as connector.py, over all recorded channels
+    import numpy as np
+    from src.preprocessing import design_filters, preprocess_chunk
+    filters = design_filters(sfreq)
+    step = int(CHUNK_SECONDS * sfreq)
+    chunks = [
+        preprocess_chunk(data[start:start + step].T, filters).T
+        for start in range(0, len(data) - step + 1, step)
+    ]
+    if not chunks:
+        raise ValueError("recording is shorter than one chunk")
+    return np.concatenate(chunks)
+
+
+def load_recording(path):
+    """
+    Load the preprocessed montage channels of a recording.
+    Args:
+        path: recording path (see RECORDING_PATTERNS)
+    Returns:
+        tuple: (eeg, sfreq), eeg of shape (n_samples, len(montage.channels))
+    Raises:
+        ValueError: if the file is unreadable or lacks a montage channel
+    """
+    from src.archive import ArchiveReader
+    from src.preprocessing import get_dtype
+    if path.endswith(".fif"):
+        import mne
+        raw = mne.io.read_raw_fif(path, preload=True, verbose=False)
+        raw.pick(mne.pick_types(raw.info, eeg=True))
+        channels, sfreq, data = raw.ch_names, raw.info["sfreq"], raw.get_data().T
+    else:
+        with ArchiveReader(path) as reader:
+            channels, sfreq = reader.channels, reader.sfreq
+            _, data = reader.read()
+    missing = [name for name in get_montage().channels if name not in channels]
+    if missing:
+        raise ValueError(f"{path} has no channel {', '.join(missing)}")
+    data = data.astype(get_dtype())
+    if os.path.splitext(path)[0].endswith("-raw"):
+        data = _preprocess(data, sfreq)
+    columns = [channels.index(name) for name in get_montage().channels]
+    return data[:, columns], sfreq
+
+
+def window_bounds(n_samples, sfreq, count):
+    """
+    Return up to ``count`` windows ending on minute marks, counted back from the end.
+    Windows are WINDOW_SECONDS long (shorter at the start of the recording,
+    but at least STEP_SECONDS).
+    Args:
+        n_samples: length of the recording
+        sfreq: sampling frequency
+        count: maximum number of windows
+    Returns:
+        np.ndarray: shape (n_windows, 2), [start, stop) sample indices, oldest first
+    """
+    import numpy as np
+    window = int(WINDOW_SECONDS * sfreq)
+    step = int(STEP_SECONDS * sfreq)
+    stops = n_samples - step * np.arange(count)
+    stops = stops[stops >= step][::-1]
+    return np.column_stack((np.maximum(stops - window, 0), stops))
+
+
+def baseline_readings(recordings, count):
+    """
+    Compute the focus and tiredness readings collect_baseline would have taken.
+    Recordings are used newest first until ``count`` readings are found.
+    Each recording is evaluated in one vectorized pass; the levels come from
+    fresh models fed in time order, so the live models are left untouched.
+    Args:
+        recordings: paths, newest first (see recent_recordings)
+        count: number of readings wanted
+    Returns:
+        tuple: (focus, tiredness) lists of levels, oldest first, at most ``count`` each
+    """
+    import numpy as np
+    models = (FocusModel(), TirednessModel())
+    # Readings are mean_metrics() values, so models get the mean path's inputs
+    names = [model_features(model, mean=True) for model in models]
+    targets = list(dict.fromkeys(name for args in names for name in args.values()))
+    segments = []
+    for path in recordings:
+        if count <= 0:
+            break
+        try:
+            eeg, sfreq = load_recording(path)
+            bounds = window_bounds(len(eeg), sfreq, count)
+            if len(bounds) == 0:
+                continue
+            powers = windowed_band_powers(eeg, sfreq, bounds)
+        except (ValueError, OSError) as exc:
+            logging.getLogger(__name__).warning("Skipping recording %s: %s", path, exc)
+            continue
+        graph = FeatureGraph.from_powers(powers, sfreq)
+        features = {name: np.atleast_1d(graph[name]) for name in targets}
+        # Windows over a flat or corrupt stretch are skipped, as the live ingest rejects them
+        valid = np.logical_and.reduce([np.isfinite(values) for values in features.values()])
+        segments.append({name: values[valid] for name, values in features.items()})
+        count -= int(valid.sum())
+    focus, tiredness = [], []
+    for features in reversed(segments):
+        for i in range(len(features[targets[0]])):
+            for model, args in zip(models, names):
+                model.calculate(**{arg: features[name][i] for arg, name in args.items()})
+            focus.append(models[0].get_value())
+            tiredness.append(models[1].get_value())
+    return focus, tiredness
@@ -0,0 +1,257 @@
+"""Feature graph for EEG metrics.
+
+Features are computed lazily from one chunk of EEG and cached, so every
+node is evaluated at most once per chunk no matter how many models use
+it::
+
+    eeg -> power.<band>            per-channel RMS band power
+        -> <band>.<region>         regional average (regions from the montage)
+        -> engagement, faa, ...    ratios registered with @feature
+        -> model inputs            each model lists the features it needs
+
+All bands required by the requested features are filtered in a single
+``band_powers`` pass. A new metric only needs a ``@feature`` function and
+a model whose ``features`` attribute names it.
+
+Feature functions work elementwise, so a graph built with
+``FeatureGraph.from_powers`` over windowed band powers (see
+``windowed_band_powers``) evaluates every window at once.
+"""
+
+from functools import lru_cache
+
+from src.models.montage import get_montage
+from src.preprocessing import filter_bank
+
+# --- EEG band definitions (Hz)
+BANDS = {
+    'delta': (1, 4),
+    'theta': (4, 8),
+    'alpha': (8, 13),
+    'beta': (13, 30),
+    'gamma': (30, 40),
+}
+
+# Small constant that keeps ratios and logs finite
+EPS = 1e-6
+
+# Registered features: name -> (dependency names, function)
+FEATURES = {}
+
+
+@lru_cache(maxsize=None)
+def band_sos(sfreq, band, dtype='float64'):
+    """
+    Return (and cache) the 2nd order Butterworth bandpass SOS for a band.
+    Args:
+        sfreq: float, sampling frequency
+        band: tuple (low, high)
+        dtype: dtype name of the coefficients (filtering keeps the data dtype only if they match)
+    Returns:
+        np.ndarray: SOS coefficients
+    """
+    from scipy.signal import butter
+    sos = butter(2, [band[0]/(0.5*sfreq), band[1]/(0.5*sfreq)], btype='bandpass', output='sos')
+    return sos.astype(dtype)
+
+
+def band_powers(eeg, sfreq, bands=('alpha', 'beta', 'theta')):
+    """
+    Calculate RMS bandpower of every channel at once.
+    Args:
+        eeg: np.ndarray, shape (n_samples, n_channels)
+        sfreq: float, sampling frequency
+        bands: names of bands from BANDS
+    Returns:
+        dict: band name -> np.ndarray, shape (n_channels,)
+    """
+    import numpy as np
+    soses = [band_sos(sfreq, BANDS[name], eeg.dtype.name) for name in bands]
+    filtered = filter_bank(soses, eeg, axis=0)
+    powers = {}
+    for name, band in zip(bands, filtered):
+        powers[name] = np.sqrt(np.mean(band**2, axis=0))
+    return powers
+
+
+def windowed_band_powers(eeg, sfreq, bounds, bands=('alpha', 'beta', 'theta')):
+    """
+    Calculate RMS bandpower of every channel over many windows of one recording.
+    The recording is filtered once per band; window means come from a cumulative sum.
+    Args:
+        eeg: np.ndarray, shape (n_samples, n_channels)
+        sfreq: float, sampling frequency
+        bounds: np.ndarray, shape (n_windows, 2), [start, stop) sample indices
+        bands: names of bands from BANDS
+    Returns:
+        dict: band name -> np.ndarray, shape (n_windows, n_channels)
+    """
+    import numpy as np
+    soses = [band_sos(sfreq, BANDS[name], eeg.dtype.name) for name in bands]
+    filtered = filter_bank(soses, eeg, axis=0)
+    start, stop = bounds[:, 0], bounds[:, 1]
+    powers = {}
+    for name, band in zip(bands, filtered):
+        energy = np.zeros((band.shape[0] + 1, band.shape[1]))
+        np.cumsum(band**2, axis=0, out=energy[1:])
+        mean = (energy[stop] - energy[start]) / (stop - start)[:, None]
+        powers[name] = np.sqrt(np.maximum(mean, 0.0))
+    return powers
+
+
+def feature(name, *deps):
+    """Register a feature computed from other features.
+
+    Args:
+        name: Feature name (a valid identifier, used as a model argument).
+        *deps: Names of the features passed to the function, in order.
+
+    """
+    def register(fn):
+        FEATURES[name] = (deps, fn)
+        return fn
+    return register
+
+
+@feature("engagement", "beta.frontal_central", "alpha.frontal_central", "theta.frontal_central")
+def engagement(beta, alpha, theta):
+    """Engagement index beta / (alpha + theta) over frontal and central sites."""
+    return beta / (alpha + theta + EPS)
+
+
+@feature("beta_theta", "beta.frontal_central", "theta.frontal_central")
+def beta_theta_ratio(beta, theta):
+    """Frontal and central beta / theta ratio."""
+    return beta / (theta + EPS)
+
+
+@feature("faa", "alpha.frontal_right", "alpha.frontal_left")
+def frontal_alpha_asymmetry(alpha_right, alpha_left):
+    """Frontal alpha asymmetry log(alpha F4) - log(alpha F3)."""
+    import numpy as np
+    return np.log(alpha_right + EPS) - np.log(alpha_left + EPS)
+
+
+@feature("beta_alpha", "beta.frontal", "alpha.frontal")
+def beta_alpha_ratio(beta, alpha):
+    """Frontal beta / alpha ratio."""
+    return beta / (alpha + EPS)
+
+
+@feature("relative_theta_alpha", "theta.parieto_occipital", "alpha.parieto_occipital", "beta.parieto_occipital")
+def relative_theta_alpha(theta, alpha, beta):
+    """(theta + alpha) / (theta + alpha + beta) over parietal and occipital sites."""
+    return (theta + alpha) / (abs(alpha) + abs(beta) + abs(theta) + EPS)
+
+
+class FeatureGraph:
+    """Lazily evaluated, cached features of one EEG chunk.
+
+    Attributes:
+        eeg (np.ndarray): Chunk, shape (n_samples, len(montage.channels)),
+            or None for a graph built from band powers.
+        sfreq (float): Sampling frequency in Hz.
+
+    """
+
+    def __init__(self, eeg, sfreq, targets=()):
+        """Create the graph for a chunk.
+
+        Args:
+            eeg: np.ndarray, shape (n_samples, len(montage.channels)).
+            sfreq: Sampling frequency in Hz.
+            targets: Features that will be requested; the bands they need
+                are filtered together in one pass.
+
+        """
+        self.eeg = eeg
+        self.sfreq = sfreq
+        self._cache = {}
+        self._bands = []
+        for name in self._closure(targets):
+            kind, _, band = name.partition(".")
+            if kind == "power" and band not in self._bands:
+                self._bands.append(band)
+
+    @classmethod
+    def from_powers(cls, powers, sfreq):
+        """Create a graph over precomputed band powers.
+
+        Args:
+            powers: dict band name -> np.ndarray, shape (..., len(montage.channels)).
+                Leading axes (e.g. windows) carry through to every feature.
+            sfreq: Sampling frequency in Hz.
+
+        """
+        graph = cls(None, sfreq)
+        graph._cache.update({f"power.{band}": power for band, power in powers.items()})
+        return graph
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            self._cache[name] = self._compute(name)
+        return self._cache[name]
+
+    def inputs(self, names):
+        """Return {argument: value} for feature names, or for a {argument: feature name} mapping."""
+        if not isinstance(names, dict):
+            names = {name: name for name in names}
+        return {arg: self[name] for arg, name in names.items()}
+
+    def _deps(self, name):
+        if name in FEATURES:
+            return FEATURES[name][0]
+        kind, _, arg = name.partition(".")
+        if kind == "power" and arg in BANDS:
+            return ()
+        if kind in BANDS and arg:
+            return (f"power.{kind}",)
+        raise KeyError(f"Unknown feature '{name}'")
+
+    def _closure(self, names):
+        seen = []
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in seen:
+                seen.append(name)
+                stack.extend(self._deps(name))
+        return seen
+
+    def _compute(self, name):
+        import numpy as np
+
+        if name in FEATURES:
+            deps, fn = FEATURES[name]
+            return fn(*(self[d] for d in deps))
+        kind, _, arg = name.partition(".")
+        if kind == "power":
+            # One filtering pass for every planned band not computed yet
+            bands = [b for b in self._bands if f"power.{b}" not in self._cache]
+            if arg not in bands:
+                bands = [arg]
+            for band, power in band_powers(self.eeg, self.sfreq, bands).items():
+                self._cache[f"power.{band}"] = power
+            return self._cache[name]
+        if kind not in BANDS or not arg:
+            raise KeyError(f"Unknown feature '{name}'")
+        value = np.mean(self[f"power.{kind}"][..., get_montage().groups[arg]], axis=-1)
+        return float(value) if value.ndim == 0 else value
+
+
+def model_features(model, mean=False):
+    """Return {``calculate`` argument: feature name} for a model.
+
+    Models name their inputs in ``features``. On the ``mean_metrics`` path
+    (the whole EEG buffer), ``mean_features`` can feed some of those
+    arguments from another feature.
+    """
+    names = {name: name for name in model.features}
+    if mean:
+        names.update(getattr(model, "mean_features", {}))
+    return names
+
+
+def update_model(model, graph, mean=False):
+    """Feed a model the features it declares (see ``model_features``)."""
+    model.calculate(**graph.inputs(model_features(model, mean)))
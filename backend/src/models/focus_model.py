@@ -1,34 +1,41 @@
 """Focus model utilities.
 
-This module estimates a user's focus level from EEG beta wave inputs.
-The model averages the provided beta wave values and scales them to an
-integer in the 0-100 range.
+This module estimates a user's focus level from the EEG engagement index
+beta / (alpha + theta). The index is normalized against the range seen so
+far and scaled to an integer in the 0-100 range.
 """
 
-import numpy as np
-
 
 class FocusModel:
-    """Estimate focus from EEG beta waves.
+    """Estimate focus from the EEG engagement index.
 
     Attributes:
+        features (tuple[str]): Features fed to ``calculate`` (see ``src.models.features``).
+        mean_features (dict): Over the whole EEG buffer (``mean_metrics``)
+            the engagement argument is fed the beta / theta ratio instead.
         _level (int): Cached focus level in the range 0-100.
 
     """
 
+    features = ("engagement",)
+    mean_features = {"engagement": "beta_theta"}
+
     def __init__(self):
         self._level = 0
         # Adaptive normalization range
         self._min = 0.1  # default lower bound (more sensitive)
         self._max = 1.0  # default upper bound (more sensitive)
 
-    def calculate(self, focus_ratio: list[float]) -> None:
-        """Calculate and update the focus level using adaptive normalization (beta/theta).
+    def calculate(self, engagement: float) -> None:
+        """Calculate and update the focus level using adaptive normalization.
 
         Args:
-            focus_ratio: List of beta/theta values.
+            engagement: Engagement index beta / (alpha + theta), or
+                beta / theta for mean metrics.
         """
-        val = np.mean(focus_ratio)
+        import numpy as np
+
+        val = float(engagement)
         # Adaptive range update
         if val < self._min:
             self._min = val
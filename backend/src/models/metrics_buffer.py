@@ -1,164 +1,309 @@
 """
 Metrics buffer and utility functions for EEG analysis.
+
+numpy and scipy are imported inside the functions that use them, so
+importing this module (and the API on top of it) stays fast.
 """
 
 import glob
+import itertools
 import os
+import time
 from collections import deque
-import numpy as np
-from src.models.focus_model import focus_service
-from src.models.stress_model import stress_service
-from src.models.tiredness_model import tiredness_service
+from src.models.features import BANDS, FeatureGraph, band_sos, model_features, update_model
+from src.models.focus_model import FocusModel, focus_service
+from src.models.montage import get_montage
+from src.models.signal_view import SignalHistory
+from src.preprocessing import get_dtype
+from src.snapshots import read_snapshot
+from src.models.stress_model import StressModel, stress_service
+from src.models.tiredness_model import TirednessModel, tiredness_service
 
-# Buffer for the last 24 EEG readings (2 minutes at 5s interval)
-_eeg_buffer = deque(maxlen=24)
+# Chunks kept in a pipeline's EEG buffer (2 minutes at 5s interval)
+BUFFER_CHUNKS = 24
 
-from scipy.signal import butter, sosfiltfilt
-"""
-Metrics buffer and utility functions for EEG analysis.
-"""
+# (path, mtime_ns, size) of the last snapshot that was ingested
+_last_snapshot = None
+# (path, mtime_ns, size) of the last snapshot that could not be ingested
+_failed_snapshot = None
+
+# Remote headsets kept at once (HOTB_MAX_DEVICES); ingest from a new one is refused beyond that
+MAX_DEVICES = int(os.environ.get("HOTB_MAX_DEVICES", "16"))
+# Seconds without an accepted chunk after which a remote headset can be dropped (HOTB_DEVICE_IDLE_SECONDS)
+DEVICE_IDLE_SECONDS = float(os.environ.get("HOTB_DEVICE_IDLE_SECONDS", "600"))
+
+
+class DeviceLimitError(RuntimeError):
+    """Raised when a new remote headset would exceed MAX_DEVICES."""
 
-# --- EEG band definitions (Hz)
-BANDS = {
-    'delta': (1, 4),
-    'theta': (4, 8),
-    'alpha': (8, 13),
-    'beta': (13, 30),
-    'gamma': (30, 40),
-}
+# Sampling frequency of the headset (Hz), as in connector.py
+SFREQ = 250
 
-def bandpower_rms(data, sfreq, band):
+# Directory the connector writes snapshots to
+DATA_DIR = os.environ.get(
+    "HOTB_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "../BrainAccessData"),
+)
+
+def warmup_filters(sfreqs=(SFREQ,)):
     """
-    Calculate RMS bandpower for a given band and channel.
+    Import scipy.signal and precompute the band filters for the given sampling rates,
+    so the first request does not pay for it.
     Args:
-        data: np.ndarray, shape (n_samples,)
-        sfreq: float, sampling frequency
-        band: tuple (low, high)
+        sfreqs: iterable of sampling frequencies
+    """
+    import logging
+    import numpy as np
+    from scipy.signal import sosfiltfilt
+    dtype = get_dtype()
+    for sfreq in sfreqs:
+        for band in BANDS.values():
+            sosfiltfilt(band_sos(sfreq, band, dtype.name), np.zeros(64, dtype=dtype))
+    logging.getLogger(__name__).info("Band filters ready for sfreq=%s", list(sfreqs))
+
+# Models fed from every chunk of the local headset, with the features they need
+MODELS = (focus_service, stress_service, tiredness_service)
+
+def compute_features(eeg, models=MODELS, mean=False):
+    """
+    Build the feature graph of a chunk, planned for every model's inputs.
+    Args:
+        eeg: np.ndarray, shape (n_samples, len(montage.channels))
+        models: models whose inputs the graph is planned for
+        mean: plan for the inputs of the mean_metrics path (see ``model_features``)
     Returns:
-        float: RMS bandpower
+        FeatureGraph: lazily evaluated, cached features
     """
-    sos = butter(2, [band[0]/(0.5*sfreq), band[1]/(0.5*sfreq)], btype='bandpass', output='sos')
-    filtered = sosfiltfilt(sos, data)
-    return np.sqrt(np.mean(filtered**2))
+    targets = [name for model in models for name in model_features(model, mean).values()]
+    return FeatureGraph(eeg, SFREQ, targets)
 
-def mean_metrics():
+# Source of MetricsPipeline.serial
+_serials = itertools.count()
+
+class MetricsPipeline:
+    """
+    EEG buffer and models of one headset.
+
+    Attributes:
+        buffer (deque): Last BUFFER_CHUNKS EEG readings as
+            (mean timestamp, eeg) pairs; eeg holds only the montage channels,
+            shape (n_samples, len(montage.channels)).
+        generation (int): Bumped every time a new chunk lands in the buffer.
+            Polled endpoints derive their ETags from it.
+        latest (dict): Metrics computed from the last ingested chunk, or None.
+        models (tuple): (focus, stress, tiredness) models.
+        signal (SignalHistory): Recent filtered EEG for live charts.
+        updated_at (float): time.monotonic() of creation or of the last ingested chunk.
+        serial (int): Unique per pipeline, so a device dropped and added again
+            does not reuse the version tags of its old pipeline.
+    """
+
+    def __init__(self, models=None):
+        self.buffer = deque(maxlen=BUFFER_CHUNKS)
+        self.generation = 0
+        self.latest = None
+        self.models = models or (FocusModel(), StressModel(), TirednessModel())
+        self.signal = SignalHistory(SFREQ)
+        self.updated_at = time.monotonic()
+        self.serial = next(_serials)
+        # Result of mean_metrics() for the generation it was computed at
+        self._mean_cache = (None, None)
+
+    def _levels(self):
+        focus, stress, tiredness = (model.get_value() for model in self.models)
+        return {"focus_level": focus, "stress_level": stress, "tiredness_level": tiredness}
+
+    def ingest(self, timestamps, eeg):
+        """
+        Append a chunk to the buffer and update the models from it.
+        Args:
+            timestamps: np.ndarray, shape (n_samples,), epoch seconds
+            eeg: np.ndarray, shape (n_samples, len(montage.channels))
+        Returns:
+            float: mean timestamp of the buffer
+        Raises:
+            ValueError: if the chunk is too short to filter or gives non-finite
+                features; the state is left unchanged
+        """
+        import logging
+        import numpy as np
+        features = compute_features(eeg, self.models)
+        # Evaluate every model input now, so a bad chunk is rejected before any state changes
+        inputs = [features.inputs(model.features) for model in self.models]
+        if not all(np.all(np.isfinite(value)) for args in inputs for value in args.values()):
+            raise ValueError("Chunk gives non-finite features")
+        saved = [dict(vars(model)) for model in self.models]
+        try:
+            for model, args in zip(self.models, inputs):
+                model.calculate(**args)
+        except Exception:
+            # Put the models back as they were
+            for model, state in zip(self.models, saved):
+                vars(model).update(state)
+            raise
+        self.buffer.append((float(np.mean(timestamps)), eeg))
+        self.signal.append(timestamps, eeg)
+        self.generation += 1
+        self.updated_at = time.monotonic()
+        levels = self._levels()
+        logging.getLogger(__name__).info(
+            "focus: %d, stress: %d, tiredness: %d",
+            levels["focus_level"], levels["stress_level"], levels["tiredness_level"],
+        )
+        # Mean timestamp from buffer (for API)
+        mean_ts_buf = float(np.mean([ts for (ts, _) in self.buffer]))
+        self.latest = {"timestamp": mean_ts_buf, **levels}
+        return mean_ts_buf
+
+    def cached_mean(self):
+        """
+        Return the mean metrics if they are already computed for the current generation, else None.
+        """
+        generation, result = self._mean_cache
+        return result if generation == self.generation else None
+
+    def mean_metrics(self):
+        """
+        Return mean metrics (focus, stress, tiredness, timestamp) from the last 2 minutes (EEG buffer).
+        Uses the pipeline's models for normalization to ensure consistency.
+        """
+        import logging
+        import numpy as np
+        if len(self.buffer) == 0:
+            return None
+        if self._mean_cache[0] == self.generation:
+            return self._mean_cache[1]
+        all_eeg = np.vstack([e for (ts, e) in self.buffer])
+        all_ts = [ts for (ts, e) in self.buffer]
+        mean_ts = float(np.mean(all_ts))
+        # Calculate features on the whole buffer signal (last 2 minutes)
+        features = compute_features(all_eeg, self.models, mean=True)
+        for model in self.models:
+            update_model(model, features, mean=True)
+        result = {"timestamp": mean_ts, **self._levels()}
+        logging.getLogger(__name__).info(
+            "mean_metrics (true mean): focus=%d, stress=%d, tiredness=%d, ts=%.3f",
+            result["focus_level"], result["stress_level"], result["tiredness_level"], mean_ts,
+        )
+        self._mean_cache = (self.generation, result)
+        return result
+
+# Pipeline of the local headset (snapshot CSVs), using the model singletons
+_default_pipeline = MetricsPipeline(MODELS)
+# Pipelines of remote headsets, by device id
+_pipelines = {}
+
+def get_pipeline(device_id=None, create=True):
+    """
+    Return the pipeline of a headset.
+    Args:
+        device_id: id of a remote headset, or None for the local one (snapshot CSVs)
+        create: create the pipeline of a device not seen yet (see ``add_pipeline``)
+    Returns:
+        MetricsPipeline, or None for an unknown device when ``create`` is False
+    Raises:
+        DeviceLimitError: if a pipeline would be created with MAX_DEVICES already kept
     """
-    Return mean metrics (focus, stress, tiredness, timestamp) from the last 2 minutes (EEG buffer).
-    Uses the model singletons for normalization to ensure consistency.
+    if device_id is None:
+        return _default_pipeline
+    pipeline = _pipelines.get(device_id)
+    if pipeline is None and create:
+        pipeline = add_pipeline(device_id, MetricsPipeline())
+    return pipeline
+
+def evict_idle_pipelines():
+    """
+    Drop the pipelines of remote headsets that sent nothing for DEVICE_IDLE_SECONDS.
+    Returns:
+        list[str]: ids of the dropped devices
     """
     import logging
-    if len(_eeg_buffer) == 0:
-        return None
-    all_eeg = np.vstack([e for (ts, e) in _eeg_buffer])
-    all_ts = [ts for (ts, e) in _eeg_buffer]
-    mean_ts = float(np.mean(all_ts))
-    # Assume sfreq 250 Hz (as in connector.py)
-    sfreq = 250
-    # Calculate bandpower for each channel and band
-    n_channels = all_eeg.shape[1]
-    # Calculate bandpower on the whole buffer signal (last 2 minutes)
-    alpha = np.zeros(n_channels)
-    beta = np.zeros(n_channels)
-    theta = np.zeros(n_channels)
-    for ch in range(n_channels):
-        alpha[ch] = bandpower_rms(all_eeg[:, ch], sfreq, BANDS['alpha'])
-        beta[ch] = bandpower_rms(all_eeg[:, ch], sfreq, BANDS['beta'])
-        theta[ch] = bandpower_rms(all_eeg[:, ch], sfreq, BANDS['theta'])
-    # Focus: Beta/Theta for F3,F4,C3,C4
-    beta_fc = np.mean(beta[[0,1,2,3]])
-    theta_fc = np.mean(theta[[0,1,2,3]])
-    # Stress: FAA (alpha F4 - F3), beta/alpha F3,F4
-    alpha_f3 = alpha[0]
-    alpha_f4 = alpha[1]
-    beta_f3f4 = np.mean(beta[[0,1]])
-    alpha_f3f4 = np.mean(alpha[[0,1]])
-    # Tiredness: (theta+alpha)/total for P3,P4,O1,O2
-    theta_po = np.mean(theta[[4,5,6,7]])
-    alpha_po = np.mean(alpha[[4,5,6,7]])
-    beta_po = np.mean(beta[[4,5,6,7]])
-    total_po = np.abs(alpha_po) + np.abs(beta_po) + np.abs(theta_po) + 1e-6
-    # Calculate metrics
-    focus_ratio = beta_fc / (theta_fc + 1e-6)
-    focus_service.calculate([focus_ratio])
-    faa = np.log(alpha_f4 + 1e-6) - np.log(alpha_f3 + 1e-6)
-    stress_index = beta_f3f4 / (alpha_f3f4 + 1e-6)
-    stress_service.calculate([faa + stress_index], [1.0])
-    tiredness = (theta_po + alpha_po) / total_po
-    tiredness_service.calculate([tiredness], [1.0], [1.0])
-    focus = focus_service.get_value()
-    stress = stress_service.get_value()
-    tiredness = tiredness_service.get_value()
-    logging.getLogger(__name__).info(
-        "mean_metrics (true mean): focus=%d, stress=%d, tiredness=%d, ts=%.3f",
-        focus, stress, tiredness, mean_ts,
-    )
-    return {
-        "timestamp": mean_ts,
-        "focus_level": focus,
-        "stress_level": stress,
-        "tiredness_level": tiredness,
-    }
+    cutoff = time.monotonic() - DEVICE_IDLE_SECONDS
+    idle = [device_id for device_id, pipeline in _pipelines.items() if pipeline.updated_at < cutoff]
+    for device_id in idle:
+        del _pipelines[device_id]
+        logging.getLogger(__name__).info("Dropped idle device %s", device_id)
+    return idle
+
+def make_room_for_device():
+    """
+    Drop idle remote headsets and check that a new one can be added.
+    Returns:
+        list[str]: ids of the dropped devices
+    Raises:
+        DeviceLimitError: if MAX_DEVICES headsets are kept and none is idle
+    """
+    dropped = evict_idle_pipelines()
+    if len(_pipelines) >= MAX_DEVICES:
+        raise DeviceLimitError(f"Already serving {MAX_DEVICES} devices")
+    return dropped
+
+def add_pipeline(device_id, pipeline):
+    """
+    Keep the pipeline of a new remote headset, dropping idle ones to make room.
+    Args:
+        device_id: id of the remote headset
+        pipeline: its MetricsPipeline
+    Returns:
+        MetricsPipeline: ``pipeline``
+    Raises:
+        DeviceLimitError: if MAX_DEVICES headsets are kept and none is idle
+    """
+    if device_id not in _pipelines:
+        make_room_for_device()
+    _pipelines[device_id] = pipeline
+    return pipeline
+
+def mean_metrics():
+    """
+    Return mean metrics of the local headset (see ``MetricsPipeline.mean_metrics``).
+    """
+    return _default_pipeline.mean_metrics()
+
+def latest_snapshot():
+    """
+    Return (path, mtime_ns, size) of the newest snapshot.csv in BrainAccessData, or None.
+    Only stats the files, so it is cheap enough to call on every poll.
+    """
+    newest = None
+    for path in glob.glob(os.path.join(DATA_DIR, "*-snapshot.csv")):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if newest is None or st.st_mtime_ns > newest[1]:
+            newest = (path, st.st_mtime_ns, st.st_size)
+    return newest
 
 def update_models_from_latest_csv():
     """
     Load the latest snapshot.csv from BrainAccessData, calculate bands, and update models.
     Models are updated only from the latest file. Buffer is used for mean timestamp.
+    If the latest file has not changed since the last call (ingested or rejected), nothing is recomputed.
     """
     import logging
-    data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "../BrainAccessData")
-    files = glob.glob(os.path.join(data_dir, "*-snapshot.csv"))
-    logging.getLogger(__name__).info("Found CSV files: %s", files)
-    if not files:
+    global _last_snapshot, _failed_snapshot
+    pipeline = _default_pipeline
+    snapshot = latest_snapshot()
+    if snapshot is None:
         logging.getLogger(__name__).warning("No snapshot.csv files found!")
         return None
-    latest = max(files, key=os.path.getmtime)
+    if snapshot == _last_snapshot:
+        return pipeline.latest["timestamp"]
+    if snapshot == _failed_snapshot:
+        # Already rejected; wait for the connector to write a new one
+        return pipeline.latest["timestamp"] if pipeline.latest is not None else None
+    latest = snapshot[0]
     logging.getLogger(__name__).info("Using file: %s", latest)
-    arr = np.genfromtxt(latest, delimiter=",", skip_header=1)
-    logging.getLogger(__name__).info("Loaded array shape: %s", arr.shape)
-    if arr.ndim == 1:
-        arr = arr[np.newaxis, :]
-    timestamps = arr[:, 0]
-    eeg = arr[:, 1:9]
-    logging.getLogger(__name__).info("EEG shape: %s", eeg.shape)
-    mean_ts = float(np.mean(timestamps))
-    _eeg_buffer.append((mean_ts, eeg))
-    if len(_eeg_buffer) == 0:
-        logging.getLogger(__name__).warning("EEG buffer is empty!")
-        return None
-    sfreq = 250
-    n_channels = eeg.shape[1]
-    alpha = np.zeros(n_channels)
-    beta = np.zeros(n_channels)
-    theta = np.zeros(n_channels)
-    for ch in range(n_channels):
-        alpha[ch] = bandpower_rms(eeg[:, ch], sfreq, BANDS['alpha'])
-        beta[ch] = bandpower_rms(eeg[:, ch], sfreq, BANDS['beta'])
-        theta[ch] = bandpower_rms(eeg[:, ch], sfreq, BANDS['theta'])
-    beta_fc = np.mean(beta[[0,1,2,3]])
-    alpha_fc = np.mean(alpha[[0,1,2,3]])
-    theta_fc = np.mean(theta[[0,1,2,3]])
-    alpha_f3 = alpha[0]
-    alpha_f4 = alpha[1]
-    beta_f3f4 = np.mean(beta[[0,1]])
-    alpha_f3f4 = np.mean(alpha[[0,1]])
-    theta_po = np.mean(theta[[4,5,6,7]])
-    alpha_po = np.mean(alpha[[4,5,6,7]])
-    beta_po = np.mean(beta[[4,5,6,7]])
-    total_po = np.abs(alpha_po) + np.abs(beta_po) + np.abs(theta_po) + 1e-6
-    engagement = beta_fc / (alpha_fc + theta_fc + 1e-6)
-    focus_service.calculate([engagement])
-    faa = np.log(alpha_f4 + 1e-6) - np.log(alpha_f3 + 1e-6)
-    stress_index = beta_f3f4 / (alpha_f3f4 + 1e-6)
-    stress_service.calculate([faa + stress_index], [1.0])
-    tiredness = (theta_po + alpha_po) / total_po
-    tiredness_service.calculate([tiredness], [1.0], [1.0])
-    logging.getLogger(__name__).info(
-        "focus: %d, stress: %d, tiredness: %d",
-        focus_service.get_value(),
-        stress_service.get_value(),
-        tiredness_service.get_value(),
-    )
-    # Mean timestamp from buffer (for API)
-    all_ts = [ts for (ts, _) in _eeg_buffer]
-    mean_ts_buf = float(np.mean(all_ts))
+    try:
+        # Load only the time column and the channels the montage uses
+        timestamps, eeg = read_snapshot(latest, get_montage().columns, get_dtype())
+        logging.getLogger(__name__).info("EEG shape: %s", eeg.shape)
+        mean_ts_buf = pipeline.ingest(timestamps, eeg)
+    except ValueError as exc:
+        # Malformed or too short snapshot: keep the previous state
+        logging.getLogger(__name__).warning("Skipping snapshot %s: %s", latest, exc)
+        _failed_snapshot = snapshot
+        return pipeline.latest["timestamp"] if pipeline.latest is not None else None
+    _last_snapshot = snapshot
     return mean_ts_buf
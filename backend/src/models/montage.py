@@ -0,0 +1,122 @@
+"""Montage (electrode layout) configuration.
+
+A montage maps electrode names such as F3 or O1 to the column that holds
+them in a recording, and groups electrodes into the regions the metrics
+are computed from. It is resolved once into index arrays, so the metric
+code never hard-codes channel positions and only the channels it needs
+are loaded and filtered.
+
+The active montage is chosen with the ``HOTB_MONTAGE`` environment
+variable: either the name of a preset below or a path to a JSON file::
+
+    {"channels": {"F3": 1, "F4": 2, "P3": 3, "O1": 4}}
+
+An optional "regions" key overrides the default regions.
+"""
+
+import json
+import os
+from functools import lru_cache
+
+# Default regions used by the metrics
+REGIONS = {
+    # Focus: engagement over frontal and central sites
+    "frontal_central": ["F3", "F4", "C3", "C4"],
+    # Stress: beta/alpha over frontal sites and frontal alpha asymmetry (right - left)
+    "frontal": ["F3", "F4"],
+    "frontal_left": ["F3"],
+    "frontal_right": ["F4"],
+    # Tiredness: relative theta+alpha over parietal and occipital sites
+    "parieto_occipital": ["P3", "P4", "O1", "O2"],
+}
+
+# Presets: electrode name -> column index in the recording (column 0 is time)
+PRESETS = {
+    # BrainAccess MINI cap as configured in connector.py
+    "brainaccess_mini": {
+        "F3": 1, "F4": 2, "C3": 3, "C4": 4,
+        "P3": 5, "P4": 6, "O1": 7, "O2": 8,
+    },
+    # Mock recorder (data/eeg_recordings): ch1-ch4, then accelerometer and battery
+    "mock": {"F3": 1, "F4": 2, "P3": 3, "O1": 4},
+}
+
+DEFAULT_PRESET = "brainaccess_mini"
+
+
+class Montage:
+    """Electrode layout resolved into index arrays.
+
+    Attributes:
+        channels (list[str]): Electrodes used by at least one region, in column order.
+        columns (np.ndarray): Recording columns of ``channels``.
+        groups (dict[str, np.ndarray]): Region name -> indices into ``channels``.
+
+    """
+
+    def __init__(self, channels: dict[str, int], regions: dict[str, list[str]] | None = None):
+        """Resolve a montage.
+
+        Args:
+            channels: Electrode name -> column index in the recording.
+            regions: Region name -> electrode names. Electrodes missing from
+                ``channels`` are skipped. Defaults to ``REGIONS``.
+
+        Raises:
+            ValueError: If a column is not a positive integer (column 0 is
+                time), two electrodes share a column, or a region has none
+                of its electrodes in ``channels``.
+
+        """
+        import numpy as np
+
+        for name, column in channels.items():
+            if isinstance(column, bool) or not isinstance(column, int) or column < 1:
+                raise ValueError(f"Electrode '{name}' has column {column!r}; columns start at 1 (column 0 is time)")
+        by_column = {}
+        for name, column in channels.items():
+            if column in by_column:
+                raise ValueError(f"Electrodes '{by_column[column]}' and '{name}' share column {column}")
+            by_column[column] = name
+        regions = REGIONS if regions is None else regions
+        used = set()
+        for region, names in regions.items():
+            present = [n for n in names if n in channels]
+            if not present:
+                raise ValueError(f"Montage has no electrodes for region '{region}' ({', '.join(names)})")
+            used.update(present)
+        self.channels = sorted(used, key=lambda n: channels[n])
+        self.columns = np.array([channels[n] for n in self.channels], dtype=int)
+        position = {name: i for i, name in enumerate(self.channels)}
+        self.groups = {
+            region: np.array([position[n] for n in names if n in position], dtype=int)
+            for region, names in regions.items()
+        }
+
+
+def load_montage(spec: str) -> Montage:
+    """Build a montage from a preset name or a JSON file path.
+
+    Args:
+        spec: Preset name (see ``PRESETS``) or path to a JSON file.
+
+    Returns:
+        Montage: The resolved montage.
+
+    Raises:
+        ValueError: If ``spec`` is neither a preset nor an existing file.
+
+    """
+    if spec in PRESETS:
+        return Montage(PRESETS[spec])
+    if not os.path.isfile(spec):
+        raise ValueError(f"Unknown montage '{spec}': not a preset ({', '.join(PRESETS)}) or a file")
+    with open(spec) as f:
+        config = json.load(f)
+    return Montage(config["channels"], config.get("regions"))
+
+
+@lru_cache(maxsize=1)
+def get_montage() -> Montage:
+    """Return the montage selected by ``HOTB_MONTAGE`` (resolved once)."""
+    return load_montage(os.environ.get("HOTB_MONTAGE", DEFAULT_PRESET))
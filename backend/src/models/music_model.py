@@ -10,6 +10,7 @@ class MusicModel:
 
     def __init__(self):
         self._music = "none"
+        self._version = 0
 
     def set_music(self, music: str) -> None:
         """Set the music type.
@@ -18,12 +19,14 @@ class MusicModel:
             music (str): The music type. If empty or falsy, the method does nothing.
 
         Side effects:
-            Updates _music with the music type.
+            Updates _music with the music type and bumps the version when it changes.
             Logs the change if a new music type is set.
 
         """
         if not music:
             return
+        if music != self._music:
+            self._version += 1
         self._music = music
         logging.getLogger(__name__).info("Music type set to: %s", music)
 
@@ -36,4 +39,13 @@ class MusicModel:
         """
         return self._music
 
+    def get_version(self) -> int:
+        """Return a counter that changes whenever the music type changes.
+
+        Returns:
+            int: The music version.
+
+        """
+        return self._version
+
 music_service = MusicModel()
@@ -35,6 +35,32 @@ class PomodoroSession:
         if metrics is not None:
             self.baseline_focus.append(metrics["focus_level"])
             self.baseline_tiredness.append(metrics["tiredness_level"])
+        self._update_baseline()
+
+    def load_baseline(self, recordings=None):
+        """
+        Fill the baseline from stored recordings instead of waiting for live readings.
+        Takes one reading per minute of the most recent recordings, as collect_baseline
+        would have. If they cover less than min_baseline_minutes, the readings found are
+        kept and collect_baseline adds the rest.
+        Args:
+            recordings (list[str]): Recording paths, newest first (default: today's
+                recordings in BrainAccessData, see src.models.baseline.recent_recordings).
+        Returns:
+            bool: True if the session is unlocked.
+        """
+        from src.models.baseline import baseline_readings, recent_recordings
+        if recordings is None:
+            recordings = recent_recordings()
+        needed = self.min_baseline_minutes - len(self.baseline_focus)
+        focus, tiredness = baseline_readings(recordings, needed)
+        # Stored readings are older than any live ones
+        self.baseline_focus[:0] = focus
+        self.baseline_tiredness[:0] = tiredness
+        self._update_baseline()
+        return self.unlocked
+
+    def _update_baseline(self):
         # Unlock after min_baseline_minutes
         if len(self.baseline_focus) >= self.min_baseline_minutes:
             self.unlocked = True
@@ -0,0 +1,154 @@
+"""Downsampled view of the filtered EEG for live charts.
+
+``SignalHistory`` keeps the last few minutes of preprocessed samples of
+one headset and serves them reduced to one (min, max) pair per bucket,
+so a chart of N pixels gets about N points per channel whatever the
+sampling rate, and spikes stay visible.
+
+Buckets are aligned to absolute sample numbers, so a bucket never
+changes once it is full. Every resolution (bucket size) that has been
+requested is cached; when a chunk arrives only the unfinished last
+bucket and the new samples are reduced.
+"""
+
+from collections import OrderedDict, deque
+
+# Seconds of signal kept per headset
+HISTORY_SECONDS = 120
+
+# Resolutions cached per headset (least recently used are dropped)
+MAX_RESOLUTIONS = 8
+
+
+class _Buckets:
+    """Min/max buckets of ``size`` samples, for one resolution.
+
+    Attributes:
+        first (int): Absolute index of the first stored bucket.
+        times, mins, maxs (np.ndarray): Start time, minimum and maximum of
+            each stored bucket; mins/maxs have shape (n_buckets, n_channels).
+        end (int): Absolute sample index up to which buckets are computed.
+
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.first = 0
+        self.times = self.mins = self.maxs = None
+        self.end = 0
+
+    def update(self, history):
+        """Reduce the samples added to ``history`` since the last update."""
+        import numpy as np
+
+        size = self.size
+        start = history.start
+        if self.times is None or self.end < start:
+            # Nothing usable cached: reduce everything still in the history
+            self.times = self.mins = self.maxs = None
+            from_bucket = start // size
+        else:
+            # Redo the last bucket if it was incomplete, and drop expired ones
+            from_bucket = self.end // size
+            keep = max(from_bucket - self.first, 0)
+            drop = max(start // size - self.first, 0)
+            self.times = self.times[drop:keep]
+            self.mins = self.mins[drop:keep]
+            self.maxs = self.maxs[drop:keep]
+            self.first += drop
+        from_sample = max(from_bucket * size, start)
+        times, eeg = history.samples(from_sample)
+        if len(times):
+            # Bucket boundaries relative to from_sample
+            edges = np.arange(from_bucket * size, history.end, size)
+            edges = np.maximum(edges - from_sample, 0)
+            mins = np.minimum.reduceat(eeg, edges, axis=0)
+            maxs = np.maximum.reduceat(eeg, edges, axis=0)
+            if self.times is None or len(self.times) == 0:
+                self.first = from_bucket
+                self.times, self.mins, self.maxs = times[edges], mins, maxs
+            else:
+                self.times = np.concatenate((self.times, times[edges]))
+                self.mins = np.concatenate((self.mins, mins))
+                self.maxs = np.concatenate((self.maxs, maxs))
+        self.end = history.end
+
+
+class SignalHistory:
+    """Recent filtered EEG of one headset with cached min/max views.
+
+    Attributes:
+        sfreq (float): Sampling frequency in Hz.
+        start (int): Absolute index of the oldest sample kept.
+        end (int): Absolute index one past the newest sample.
+
+    """
+
+    def __init__(self, sfreq, seconds=HISTORY_SECONDS):
+        self.sfreq = sfreq
+        self.capacity = int(seconds * sfreq)
+        self.start = 0
+        self.end = 0
+        # (absolute index of first sample, times, eeg) per chunk
+        self._chunks = deque()
+        self._levels = OrderedDict()
+
+    def append(self, times, eeg):
+        """Add a chunk.
+
+        Args:
+            times: np.ndarray, shape (n_samples,), epoch seconds.
+            eeg: np.ndarray, shape (n_samples, n_channels).
+
+        """
+        self._chunks.append((self.end, times, eeg))
+        self.end += len(times)
+        # Drop whole chunks that fell out of the window
+        while self._chunks and self._chunks[0][0] + len(self._chunks[0][1]) <= self.end - self.capacity:
+            self._chunks.popleft()
+        self.start = self._chunks[0][0] if self._chunks else self.end
+
+    def samples(self, start):
+        """Return (times, eeg) from absolute index ``start`` (>= ``self.start``) to the end."""
+        import numpy as np
+
+        parts = [(i, t, e) for (i, t, e) in self._chunks if i + len(t) > start]
+        if not parts:
+            return np.empty(0), np.empty((0, 0))
+        skip = start - parts[0][0]
+        times = np.concatenate([t for (_, t, _) in parts])[skip:]
+        eeg = np.concatenate([e for (_, _, e) in parts])[skip:]
+        return times, eeg
+
+    def minmax(self, seconds, width):
+        """Return the last ``seconds`` of signal as ``width`` min/max buckets.
+
+        Args:
+            seconds: Time span to show; capped at the history length.
+            width: Number of buckets (chart width in pixels).
+
+        Returns:
+            dict: "bucket_seconds", "t" (start time of each bucket) and
+            "min"/"max" (one list per channel), or None if there is no signal.
+
+        """
+        import math
+
+        if self.end == self.start:
+            return None
+        span = min(int(seconds * self.sfreq), self.capacity)
+        size = max(math.ceil(span / width), 1)
+        level = self._levels.pop(size, None) or _Buckets(size)
+        self._levels[size] = level
+        while len(self._levels) > MAX_RESOLUTIONS:
+            self._levels.popitem(last=False)
+        if level.end != self.end:
+            level.update(self)
+        # Skip a leading bucket that starts before the window (or the history)
+        first = max(-(-max(self.end - span, self.start) // size) - level.first, 0)
+        return {
+            "bucket_seconds": size / self.sfreq,
+            "t": level.times[first:].round(3).tolist(),
+            "min": level.mins[first:].T.tolist(),
+            "max": level.maxs[first:].T.tolist(),
+        }
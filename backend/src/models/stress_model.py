@@ -1,34 +1,38 @@
 """Stress model utilities.
 
-This module provides a simple stress estimator based on the ratio of
-beta to alpha EEG waves. The ratio is normalized and scaled to a 0-100
-integer range. Uses logger for debug information.
+This module provides a simple stress estimator based on frontal alpha
+asymmetry plus the ratio of beta to alpha EEG waves. The index is
+normalized and scaled to a 0-100 integer range. Uses logger for debug
+information.
 """
 
 import logging
 
-import numpy as np
-
 
 class StressModel:
-    """Estimate stress using beta/alpha ratio.
+    """Estimate stress using FAA and beta/alpha ratio.
 
     Attributes:
+        features (tuple[str]): Features fed to ``calculate`` (see ``src.models.features``).
         _level (int): Cached stress level scaled 0-100.
 
     """
 
+    features = ("faa", "beta_alpha")
+
     def __init__(self):
         self._level = 0
 
-    def calculate(self, stress_metric: list[float], dummy: list[float] = None) -> None:
+    def calculate(self, faa: float, beta_alpha: float) -> None:
         """Calculate and update the stress level using FAA + beta/alpha.
 
         Args:
-            stress_metric: List of stress index values (FAA + beta/alpha).
-            dummy: Unused, for compatibility.
+            faa: Frontal alpha asymmetry.
+            beta_alpha: Frontal beta/alpha ratio.
         """
-        val = np.mean(stress_metric)
+        import numpy as np
+
+        val = faa + beta_alpha
         # Norm: map from approx -2.5..2.5 to 0..1
         norm = np.clip((val + 2.5) / 5.0, 0.0, 1.0)
         if not np.isfinite(norm):
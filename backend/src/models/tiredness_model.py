@@ -1,34 +1,37 @@
 """Tiredness model utilities.
 
 This module estimates a user's tiredness level from EEG waves using the
-formula: tiredness = (alpha + theta) / beta, where all inputs are
-averaged and the result is scaled to a 0-100 integer range. Uses logger for debug information.
+relative power tiredness = (theta + alpha) / (theta + alpha + beta) over
+parietal and occipital sites, scaled to a 0-100 integer range. Uses
+logger for debug information.
 """
 
 import logging
 
-import numpy as np
-
 
 class TirednessModel:
     """Estimate tiredness from EEG alpha, theta, and beta waves.
 
     Attributes:
+        features (tuple[str]): Features fed to ``calculate`` (see ``src.models.features``).
         _level (int): Cached tiredness level in the range 0-100.
 
     """
 
+    features = ("relative_theta_alpha",)
+
     def __init__(self):
         self._level = 0
 
-    def calculate(self, tiredness_metric: list[float], dummy1: list[float] = None, dummy2: list[float] = None) -> None:
+    def calculate(self, relative_theta_alpha: float) -> None:
         """Calculate and update the tiredness level using relative (theta+alpha)/total power.
 
         Args:
-            tiredness_metric: List of relative tiredness values.
-            dummy1, dummy2: Unused, for compatibility.
+            relative_theta_alpha: Relative theta+alpha power.
         """
-        val = np.mean(tiredness_metric)
+        import numpy as np
+
+        val = float(relative_theta_alpha)
         # Norm: map from 0..1 to 0..1
         norm = np.clip(val, 0.0, 1.0)
         self._level = int(norm * 100)
@@ -0,0 +1,185 @@
+"""EEG preprocessing shared by the connector and the backend.
+
+The sample dtype of the whole data path (buffers, filter coefficients,
+snapshot files) is set with the ``HOTB_DTYPE`` environment variable:
+"float64" (default) or "float32". Timestamps always stay float64.
+
+Zero-phase filtering goes through ``filter_bank``, which can fan out over
+a thread pool (scipy releases the GIL while filtering). The pool size is
+set with ``HOTB_FILTER_WORKERS`` (default 1, i.e. serial).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+SUPPORTED_DTYPES = ("float64", "float32")
+
+# Below this many values (samples x channels x filters) threading costs more than it saves
+PARALLEL_MIN_VALUES = 100_000
+
+
+def get_dtype():
+    """Return the configured sample dtype.
+
+    Returns:
+        np.dtype: float64 or float32, from ``HOTB_DTYPE``.
+
+    Raises:
+        ValueError: If ``HOTB_DTYPE`` is not a supported dtype.
+
+    """
+    import numpy as np
+
+    name = os.environ.get("HOTB_DTYPE", "float64")
+    if name not in SUPPORTED_DTYPES:
+        raise ValueError(f"HOTB_DTYPE must be one of {', '.join(SUPPORTED_DTYPES)}, got '{name}'")
+    return np.dtype(name)
+
+
+def get_filter_workers():
+    """Return the configured filter thread count (``HOTB_FILTER_WORKERS``, default 1)."""
+    return max(int(os.environ.get("HOTB_FILTER_WORKERS", "1")), 1)
+
+
+@lru_cache(maxsize=None)
+def _filter_executor(workers):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="filter-bank")
+
+
+def filter_bank(soses, data, axis=-1, out=None, workers=None):
+    """Zero-phase filter 2-D data with each of several SOS filters.
+
+    With more than one worker and a large enough input, the work is split
+    into (filter, channel block) tasks run on a shared thread pool.
+    Small inputs are filtered serially.
+
+    Args:
+        soses: list of SOS coefficient arrays
+        data: np.ndarray, 2-D, with time along ``axis``
+        axis: time axis of ``data``
+        out: optional list of arrays (one per filter, same shape as ``data``)
+            to write the results to; an entry may be ``data`` itself when
+            there is a single filter
+        workers: thread count (defaults to ``get_filter_workers()``)
+    Returns:
+        list: filtered arrays, one per filter
+
+    """
+    import numpy as np
+    from scipy.signal import sosfiltfilt
+
+    workers = get_filter_workers() if workers is None else workers
+    if out is None:
+        out = [np.empty(data.shape, dtype=np.result_type(sos, data)) for sos in soses]
+    if workers <= 1 or data.size * len(soses) < PARALLEL_MIN_VALUES:
+        for sos, dst in zip(soses, out):
+            dst[...] = sosfiltfilt(sos, data, axis=axis)
+        return out
+
+    # Channels run along the other axis; split them so there are about `workers` tasks
+    channel_axis = 1 - (axis % 2)
+    n_blocks = min(-(-workers // len(soses)), data.shape[channel_axis])
+    bounds = np.linspace(0, data.shape[channel_axis], n_blocks + 1).astype(int)
+
+    def run(sos, dst, lo, hi):
+        index = [slice(None), slice(None)]
+        index[channel_axis] = slice(lo, hi)
+        index = tuple(index)
+        dst[index] = sosfiltfilt(sos, data[index], axis=axis)
+
+    executor = _filter_executor(workers)
+    futures = [
+        executor.submit(run, sos, dst, lo, hi)
+        for sos, dst in zip(soses, out)
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+    for future in futures:
+        future.result()
+    return out
+
+
+def butter_bandpass(lowcut, highcut, fs, order=2):
+    """Butterworth bandpass filter design."""
+    from scipy.signal import butter
+
+    nyq = 0.5 * fs
+    low = lowcut / nyq
+    high = highcut / nyq
+    sos = butter(order, [low, high], analog=False, btype="bandpass", output="sos")
+    return sos
+
+
+def design_filters(sfreq, dtype=None):
+    """Design bandpass (1-40Hz) and notch (50Hz) filters.
+
+    Args:
+        sfreq: Sampling frequency in Hz
+        dtype: Dtype of the coefficients and of the filtered data
+            (defaults to ``get_dtype()``)
+
+    Returns:
+        dict: Contains 'bandpass_sos', 'notch_sos' and 'dtype'
+
+    """
+    from scipy.signal import butter
+
+    dtype = get_dtype() if dtype is None else dtype
+
+    # Bandpass filter: 1-40 Hz
+    bandpass_sos = butter_bandpass(1, 40, sfreq, order=2)
+
+    # Notch filter: 50 Hz
+    nyq = 0.5 * sfreq
+    notch_freq = 50 / nyq
+    notch_sos = butter(2, [notch_freq - 0.01, notch_freq + 0.01],
+                       analog=False, btype="bandstop", output="sos")
+
+    return {
+        "bandpass_sos": bandpass_sos.astype(dtype),
+        "notch_sos": notch_sos.astype(dtype),
+        "dtype": dtype,
+    }
+
+
+def preprocess_chunk(chunk, filter_state, inplace=False):
+    """Preprocesses a chunk of EEG data.
+    Steps:
+      1. Remove mean from each channel
+      2. Bandpass filter (1-40 Hz)
+      3. Notch filter (50 Hz)
+      4. Average reference (re-referencing)
+
+    The chunk is converted to the filter dtype once; all steps then work
+    on that single buffer.
+
+    Args:
+        chunk: np.ndarray, shape (n_channels, n_samples)
+        filter_state: dict from ``design_filters``
+        inplace: Reuse ``chunk`` as the work buffer if it already has the
+            filter dtype (its contents are overwritten)
+    Returns:
+        chunk_clean: np.ndarray, shape (n_channels, n_samples)
+
+    """
+    import numpy as np
+
+    dtype = filter_state.get("dtype", np.float64)
+    if inplace and chunk.dtype == dtype:
+        work = chunk
+    else:
+        work = np.array(chunk, dtype=dtype)
+
+    # 1. Remove mean from each channel
+    work -= np.mean(work, axis=1, keepdims=True)
+
+    # 2. Bandpass filter
+    filter_bank([filter_state["bandpass_sos"]], work, axis=1, out=[work])
+
+    # 3. Notch filter
+    filter_bank([filter_state["notch_sos"]], work, axis=1, out=[work])
+
+    # 4. Average reference (re-referencing)
+    work -= np.mean(work, axis=0, keepdims=True)
+
+    return work
@@ -0,0 +1,65 @@
+"""Reading and writing of ``*-snapshot.csv`` files.
+
+A snapshot is a CSV with a header line, a time column (epoch seconds)
+and one column per channel. float64 samples keep numpy's default
+18-digit format; float32 samples are written with 9 significant digits,
+which is exactly enough to round-trip a float32 value.
+"""
+
+# Text format per sample dtype (the time column always keeps microseconds)
+_SAMPLE_FORMATS = {
+    "float64": "%.18e",
+    "float32": "%.9g",
+}
+
+
+def write_snapshot(path, times, data, header):
+    """Write a snapshot CSV, atomically replacing any existing file.
+
+    The data goes to a temporary file that is then renamed over ``path``,
+    so a reader polling the directory never sees a half-written snapshot.
+
+    Args:
+        path: Output file path.
+        times: np.ndarray, shape (n_samples,), epoch seconds.
+        data: np.ndarray, shape (n_channels, n_samples).
+        header: Header line without the trailing newline.
+
+    """
+    import os
+
+    import numpy as np
+
+    sample_fmt = _SAMPLE_FORMATS.get(data.dtype.name, "%.18e")
+    fmt = ["%.6f"] + [sample_fmt] * data.shape[0]
+    rows = np.column_stack((times, data.T))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        np.savetxt(f, rows, delimiter=",", header=header, comments="", fmt=fmt)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path, columns, dtype="float64"):
+    """Read selected channel columns of a snapshot CSV.
+
+    Args:
+        path: Snapshot file path.
+        columns: Column indices of the channels to load (column 0 is time).
+        dtype: Dtype of the returned samples.
+
+    Returns:
+        tuple: (times, eeg) with times float64 of shape (n_samples,) and
+        eeg of shape (n_samples, len(columns)).
+
+    Raises:
+        ValueError: If the file is malformed or has non-finite values.
+
+    """
+    import numpy as np
+
+    columns = tuple(int(c) for c in columns)
+    row = np.dtype([("time", "f8"), ("eeg", dtype, (len(columns),))])
+    arr = np.loadtxt(path, delimiter=",", skiprows=1, usecols=(0, *columns), dtype=row, ndmin=1)
+    if not (np.isfinite(arr["time"]).all() and np.isfinite(arr["eeg"]).all()):
+        raise ValueError(f"{path} has non-finite values")
+    return arr["time"], arr["eeg"]
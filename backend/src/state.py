@@ -0,0 +1,343 @@
+"""Shared backend state.
+
+All mutable server state (EEG buffers, models, music type and Pomodoro
+config) is owned by a single ``StateStore``. With one uvicorn
+worker the store lives in-process. With several workers, ``main`` starts
+a state server process that hosts the only store and exposes it over a
+local socket; every worker talks to it through a proxy, so all workers
+see the same buffer and there is a single writer for ingest.
+
+Besides the local headset (snapshot CSVs), remote connectors stream
+chunks to ``/api/ingest``; each remote device gets its own buffer and
+models, selected by ``device_id``.
+"""
+
+import logging
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from multiprocessing.managers import BaseManager
+
+from src.models import update_models_from_latest_csv
+from src.models.metrics_buffer import (
+    SFREQ,
+    MetricsPipeline,
+    add_pipeline,
+    get_pipeline,
+    make_room_for_device,
+    warmup_filters,
+)
+from src.models.montage import get_montage
+from src.models.music_model import music_service
+from src.models.pomodoro_model import PomodoroStepper
+
+# Environment variables used to hand the state server location to workers
+STATE_ADDRESS_ENV = "HOTB_STATE_ADDRESS"
+STATE_AUTHKEY_ENV = "HOTB_STATE_AUTHKEY"
+
+# Minimum time between two scans of the snapshot directory (seconds)
+SYNC_INTERVAL = 0.25
+
+
+class StateStore:
+    """Owner of all mutable backend state.
+
+    Every method returns plain picklable values so the store can be
+    served to other processes unchanged.
+
+    Attributes:
+        _lock (threading.Lock): Serializes writes (ingest, config updates).
+        _epoch (str): Identifies this store instance in version tags.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = format(time.time_ns(), "x")
+        self._pomodoro = PomodoroStepper()
+        self._pomodoro_version = 0
+        # device_id -> (stream, next expected seq) of remote connectors
+        self._streams = {}
+        self._synced_at = float("-inf")
+
+    def version(self, kind: str, device_id: str | None = None) -> str:
+        """Return the version tag of one kind of data.
+
+        For "current" and "mean" of the local headset the latest snapshot
+        is ingested first if it changed, so a long-poll on either endpoint
+        wakes when a new snapshot arrives.
+
+        Args:
+            kind: One of "current", "mean", "music", "pomodoro".
+            device_id: Remote device for "current" and "mean" (None: local headset).
+
+        Returns:
+            str: Version tag, unique across store restarts.
+
+        """
+        if kind in ("current", "mean"):
+            if device_id is None:
+                self.sync_latest_snapshot()
+            pipeline = get_pipeline(device_id, create=False)
+            if pipeline is None:
+                counter = 0
+            elif device_id is None:
+                counter = pipeline.generation
+            else:
+                # A remote device dropped when idle and added again gets a new pipeline
+                counter = f"{pipeline.serial}.{pipeline.generation}"
+        elif kind == "music":
+            counter = music_service.get_version()
+        elif kind == "pomodoro":
+            counter = self._pomodoro_version
+        else:
+            raise ValueError(f"Unknown state kind: {kind}")
+        return f"{self._epoch}-{counter}"
+
+    def warmup(self, sfreqs: list[float]) -> None:
+        """Precompute filter coefficients in a background thread.
+
+        Runs in the process that does the computing (the state server in
+        multi-worker mode), without delaying startup.
+
+        Args:
+            sfreqs: Sampling frequencies to prepare filters for.
+
+        """
+        threading.Thread(target=warmup_filters, args=(tuple(sfreqs),), daemon=True).start()
+
+    def sync_latest_snapshot(self) -> None:
+        """Ingest the newest snapshot CSV if it changed since the last sync.
+
+        The directory is scanned at most once per ``SYNC_INTERVAL``,
+        however many endpoints and workers ask for the version. If another
+        call holds the lock (an ingest or a mean recomputation), the sync
+        is skipped rather than queued: the next poll picks the snapshot up,
+        and readers never stall behind each other here.
+        """
+        if time.monotonic() - self._synced_at < SYNC_INTERVAL:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._synced_at = time.monotonic()
+            update_models_from_latest_csv()
+        finally:
+            self._lock.release()
+
+    def ingest(self, device_id: str, body: bytes) -> dict:
+        """Feed frames from a remote connector into the device's buffer.
+
+        Frames are taken in sequence order per connector stream. Frames
+        already taken (resent after a lost acknowledgement) are skipped;
+        a gap in the sequence is logged and skipped over. A frame too
+        short to filter is acknowledged but not buffered.
+
+        A device gets a buffer only once one of its frames is accepted. At
+        most ``MAX_DEVICES`` remote devices are kept; devices idle for
+        ``DEVICE_IDLE_SECONDS`` are dropped to make room for new ones.
+
+        Args:
+            device_id: Device the frames belong to.
+            body: Concatenated frames (see ``src.ingest_protocol``).
+
+        Returns:
+            dict: Acknowledgement with the highest sequence number taken
+            ("ack", -1 if none) and counts of accepted, duplicate and
+            rejected frames.
+
+        Raises:
+            ValueError: If the body is malformed, or a frame has a
+                different sampling rate or too few channels for the
+                montage. Nothing is buffered in that case.
+            DeviceLimitError: If the device is new and no room can be made for it.
+
+        """
+        from src.ingest_protocol import decode_frames
+        from src.preprocessing import get_dtype
+
+        import numpy as np
+
+        frames = decode_frames(body)
+        # Montage columns count from 1 (column 0 of a snapshot is time)
+        channels = get_montage().columns - 1
+        for frame in frames:
+            if frame.sfreq != SFREQ:
+                raise ValueError(f"Frame {frame.seq} has sfreq {frame.sfreq}, expected {SFREQ}")
+            if frame.data.shape[1] <= channels.max():
+                raise ValueError(f"Frame {frame.seq} has {frame.data.shape[1]} channels, the montage needs {channels.max() + 1}")
+        dtype = get_dtype()
+        log = logging.getLogger(__name__)
+        counts = {"accepted": 0, "duplicates": 0, "rejected": 0}
+        with self._lock:
+            pipeline = get_pipeline(device_id, create=False)
+            new = pipeline is None
+            if new:
+                # Refuse a device there is no room for before filtering anything
+                for dropped in make_room_for_device():
+                    self._streams.pop(dropped, None)
+                pipeline = MetricsPipeline()
+            stream, next_seq = self._streams.get(device_id, (None, 0))
+            for frame in frames:
+                if frame.stream != stream:
+                    # New connector run: its sequence starts over
+                    stream, next_seq = frame.stream, 0
+                if frame.seq < next_seq:
+                    counts["duplicates"] += 1
+                    continue
+                if frame.seq > next_seq:
+                    log.warning("Device %s: frames %d-%d missing", device_id, next_seq, frame.seq - 1)
+                next_seq = frame.seq + 1
+                n_samples = frame.data.shape[0]
+                times = frame.t0 + np.arange(n_samples) / frame.sfreq
+                try:
+                    pipeline.ingest(times, frame.data[:, channels].astype(dtype))
+                except ValueError as exc:
+                    log.warning("Device %s: skipping frame %d: %s", device_id, frame.seq, exc)
+                    counts["rejected"] += 1
+                    continue
+                counts["accepted"] += 1
+            if counts["accepted"] or not new:
+                if new:
+                    add_pipeline(device_id, pipeline)
+                self._streams[device_id] = (stream, next_seq)
+        return {"device_id": device_id, "stream": stream, "ack": next_seq - 1, **counts}
+
+    def current(self, device_id: str | None = None) -> dict | None:
+        """Return metrics of the last ingested chunk, or None if nothing was ingested."""
+        # A single reference read; ingest replaces the dict, never mutates it
+        pipeline = get_pipeline(device_id, create=False)
+        return pipeline.latest if pipeline is not None else None
+
+    def mean(self, device_id: str | None = None) -> dict | None:
+        """Return mean metrics over the EEG buffer, or None if it is empty."""
+        pipeline = get_pipeline(device_id, create=False)
+        if pipeline is None:
+            return None
+        cached = pipeline.cached_mean()
+        if cached is not None:
+            return cached
+        # Recomputing updates the models, so it is serialized with ingest
+        with self._lock:
+            return pipeline.mean_metrics()
+
+    def signal(self, device_id: str | None, seconds: float, width: int) -> dict | None:
+        """Return the recent filtered EEG reduced to min/max buckets.
+
+        Args:
+            device_id: Remote device, or None for the local headset.
+            seconds: Time span to return.
+            width: Number of buckets.
+
+        Returns:
+            dict | None: See ``SignalHistory.minmax``; None if there is no signal.
+
+        """
+        with self._lock:
+            pipeline = get_pipeline(device_id, create=False)
+            return pipeline.signal.minmax(seconds, width) if pipeline is not None else None
+
+    def music(self) -> str:
+        """Return the recommended music type."""
+        return music_service.get_value()
+
+    def pomodoro_config(self) -> dict:
+        """Return the Pomodoro step lengths in minutes."""
+        stepper = self._pomodoro
+        return {
+            "session_length": stepper.session_length,
+            "break_length": stepper.break_length,
+            "long_break_length": stepper.long_break_length,
+        }
+
+    def set_pomodoro_times(self, session_length: int, break_length: int, long_break_length: int) -> None:
+        """Replace the Pomodoro stepper with new step lengths (minutes)."""
+        with self._lock:
+            self._pomodoro = PomodoroStepper(
+                session_length=session_length,
+                break_length=break_length,
+                long_break_length=long_break_length,
+            )
+            self._pomodoro_version += 1
+
+
+class StateManager(BaseManager):
+    """Multiprocessing manager serving a single ``StateStore``."""
+
+
+_server_store = None
+# Workers connect concurrently; each connection is served by its own thread
+_server_store_lock = threading.Lock()
+
+
+def _get_server_store() -> StateStore:
+    global _server_store
+    with _server_store_lock:
+        if _server_store is None:
+            _server_store = StateStore()
+    return _server_store
+
+
+StateManager.register("get_store", callable=_get_server_store)
+
+_store = None
+# Route handlers call get_state from thread pool threads
+_store_lock = threading.Lock()
+
+
+def get_state():
+    """Return the state store for this process.
+
+    Connects to the shared state server when ``HOTB_STATE_ADDRESS`` is
+    set (multi-worker mode), otherwise creates an in-process store.
+
+    Returns:
+        StateStore: The store, or a proxy exposing the same methods.
+
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            address = os.environ.get(STATE_ADDRESS_ENV)
+            if address:
+                authkey = bytes.fromhex(os.environ[STATE_AUTHKEY_ENV])
+                manager = StateManager(address=address, authkey=authkey)
+                manager.connect()
+                _store = manager.get_store()
+                logging.getLogger(__name__).info("Connected to state server at %s", address)
+            else:
+                _store = StateStore()
+    return _store
+
+
+def start_state_server() -> StateManager:
+    """Start the shared state server in a child process.
+
+    The server listens on a Unix socket in a private temp directory. Its
+    address and auth key are exported through the environment so that
+    worker processes started afterwards connect to it in ``get_state``.
+
+    Returns:
+        StateManager: Running manager; pass it to ``stop_state_server`` when done.
+
+    """
+    address = os.path.join(tempfile.mkdtemp(prefix="hotb-state-"), "state.sock")
+    authkey = secrets.token_bytes(32)
+    manager = StateManager(address=address, authkey=authkey)
+    manager.start()
+    os.environ[STATE_ADDRESS_ENV] = address
+    os.environ[STATE_AUTHKEY_ENV] = authkey.hex()
+    logging.getLogger(__name__).info("State server listening on %s", address)
+    return manager
+
+
+def stop_state_server(manager: StateManager) -> None:
+    """Shut down a server started by ``start_state_server`` and remove its socket."""
+    manager.shutdown()
+    address = os.environ.pop(STATE_ADDRESS_ENV, None)
+    os.environ.pop(STATE_AUTHKEY_ENV, None)
+    if address:
+        shutil.rmtree(os.path.dirname(address), ignore_errors=True)